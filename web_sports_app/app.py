@@ -1,49 +1,47 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, session, Response, stream_with_context
 import os
+import click
 from werkzeug.utils import secure_filename
-from docx import Document
-from docx.shared import Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from io import BytesIO
-import tempfile
 import shutil
-from web_sports_app.cloud_storage import is_s3_enabled, get_s3_url
-from web_sports_app.db import get_db_connection
-from web_sports_app.cloud_storage import upload_to_s3
+import tempfile
+from web_sports_app.db import get_db_connection, pooled_connection
+from web_sports_app.storage import get_storage, is_safe_name
+from web_sports_app.responses import DOCX_MIMETYPE, ZIP_MIMETYPE, REPORT_SPOOL_MAX, send_buffer, send_document, send_report_file
+from web_sports_app.report_cache import REPORT_CACHE_ENABLED, report_cache_key, template_hash, get_cached_report, store_report, invalidate_reports
+from web_sports_app.reports import build_report, build_edited_report
+from web_sports_app.pdf_reports import PDF_FORMATS, build_pdf_report, build_edited_pdf
+from web_sports_app.streaming_docx import STREAMING_FORMATS, ZIP_FORMATS, PARALLEL_CHUNK_SIZE, StreamingReport, StudentDocuments, make_report, report_columns, report_filename
+from web_sports_app.template_engine import TEMPLATE_COLUMNS, compile_template
+from web_sports_app.student_rows import student_record, fetch_student, fetch_students, fetch_roster, iter_roster
+from web_sports_app.jobs import submit_job, get_job, cancel_job, output_path
+from web_sports_app.pagination import Page, fetch_page, get_page_size
+from web_sports_app.thumbnails import thumbnail_url, backfill_thumbnails
+from web_sports_app.photo_uploads import read_photo_upload, attach_photo, drop_photo_ref, queue_upload, queue_delete, process_upload, unfinished_uploads
+from web_sports_app.students import empty_to_none, validate_student
+from web_sports_app.bulk_import import import_students
+from web_sports_app.export import EXPORT_COLUMNS, EXPORT_FORMATS, EXPORT_WRITERS, parse_columns, build_export_query, iter_export_rows
+from web_sports_app.search import search_students, SEARCH_LIMIT, SUGGEST_LIMIT
+from web_sports_app.migrations import ensure_schema, migrate
+from web_sports_app.metrics import init_metrics
+from web_sports_app.asset_build import build_assets
+from web_sports_app.assets import asset_tags, init_assets, send_photo
 
 import psycopg2
-def empty_to_none(value):
-    return value if value else None
+from contextlib import contextmanager
 
 def init_db():
+    # Only checks the schema version; DDL runs from `flask migrate`, or
+    # here when the database is behind
     conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        dob TEXT,
-        mother_name TEXT,
-        father_name TEXT,
-        branch TEXT,
-        semester TEXT,
-        usn VARCHAR(10) UNIQUE,
-        phone VARCHAR(10),
-        email TEXT,
-        photo_path TEXT,
-        sports TEXT,
-        blood_group TEXT,
-        gender TEXT
-    )
-    """)
-
-    conn.commit()
-    conn.close()
-
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "dsatm_super_secret_2026")
+init_metrics(app)
+init_assets(app)
 try:
     init_db()
 except Exception as e:
@@ -53,7 +51,7 @@ except Exception as e:
 
 @app.context_processor
 def utility_processor():
-    return dict(get_photo_url=get_photo_url)
+    return dict(get_photo_url=get_photo_url, asset_tags=asset_tags)
 
 UPLOAD_FOLDER = 'static/uploads'
 TEMPLATE_FOLDER = 'static/templates'
@@ -64,16 +62,61 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['TEMPLATE_FOLDER'] = TEMPLATE_FOLDER
 
 
-def get_photo_url(filename):
+def get_photo_url(filename, size=None):
     if filename:
-        from web_sports_app.cloud_storage import is_s3_enabled, get_s3_url
-        if is_s3_enabled():
-            return get_s3_url(filename)
-        else:
-            return url_for('static', filename='uploads/' + filename)
+        # Backends answer from cached state, never a network call while rendering
+        if size:
+            return thumbnail_url(get_storage(), filename, size)
+        return get_storage().url(filename)
     return None
 
 
+@app.route('/media/<path:filename>')
+def media(filename):
+    storage = get_storage()
+    if not is_safe_name(filename) or not storage.exists(filename):
+        return 'Not found', 404
+    return send_photo(storage, filename)
+
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Create or upgrade the database schema. Run once per deployment."""
+    conn = get_db_connection()
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify and fingerprint CSS/JS into static/dist. Run on every deploy."""
+    manifest = build_assets(app.static_folder, os.path.join(app.root_path, app.template_folder))
+    for name, built in sorted(manifest.items()):
+        print(f"{name} -> {built}")
+
+@app.cli.command('push-photos')
+def push_photos_command():
+    """Retry photo uploads left pending by a restart or failed after every retry."""
+    with pooled_connection() as conn:
+        filenames = unfinished_uploads(conn)
+    pushed = sum(1 for filename in filenames if process_upload(filename))
+    print(f"Pushed {pushed} of {len(filenames)} photo(s)")
+
+@app.cli.command('backfill-thumbnails')
+@click.option('--force', is_flag=True, help='Regenerate thumbnails that already exist.')
+def backfill_thumbnails_command(force):
+    """Generate thumbnails for photos uploaded before the thumbnail stage."""
+    with pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT DISTINCT photo_path FROM students WHERE photo_path IS NOT NULL AND photo_path <> ''")
+        filenames = [row[0] for row in c.fetchall()]
+
+    done, skipped, failed = backfill_thumbnails(get_storage(), filenames, force=force)
+    print(f"Thumbnails: {done} generated, {skipped} already present, {failed} failed")
+
+
 @app.route('/')
 def home():
     return render_template('home.html')
@@ -101,94 +144,116 @@ def data_entry():
         blood_group = empty_to_none(request.form.get('blood_group', '').strip())
         gender = empty_to_none(request.form.get('gender', '').strip())
 
-        # ---------- PHOTO (FIXED) ----------
-        photo = request.files.get('photo')
-        photo_filename = None
+        # ---------- VALIDATION ----------
+        error = validate_student(name, usn, phone)
+        if error:
+            flash(error, 'error')
+            return redirect(request.url)
 
-        if photo and photo.filename:
-            photo_filename = secure_filename(photo.filename)
-            photo_data = photo.read()
+        # ---------- PHOTO ----------
+        # Named by its SHA-256 and only written to local disk, once per
+        # distinct photo; the upload worker pushes it to storage after the
+        # commit
+        photo_data, photo_filename = read_photo_upload(request.files.get('photo'))
 
+        # ---------- DATABASE ----------
+        with pooled_connection() as conn:
             try:
-                if is_s3_enabled():
-                    upload_to_s3(BytesIO(photo_data), photo_filename)
-                else:
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    with open(os.path.join(app.config['UPLOAD_FOLDER'], photo_filename), 'wb') as f:
-                        f.write(photo_data)
-            except Exception as e:
+                cur = conn.cursor()
+
+                cur.execute("""
+                    INSERT INTO students
+                    (name, dob, mother_name, father_name, branch, semester,
+                     usn, phone, email, photo_path, sports, blood_group, gender)
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                """, (
+                    name, dob, mother_name, father_name, branch, semester,
+                    usn, phone, email, photo_filename,
+                    sports, blood_group, gender
+                ))
+                new_photo = photo_filename is not None and attach_photo(cur, photo_data, photo_filename)
+
+                conn.commit()
+                if new_photo:
+                    queue_upload(app, photo_filename)
+                invalidate_reports([])
+                flash('Student saved successfully.', 'success')
+                return redirect(url_for('data_entry'))
+
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                flash('USN already exists.', 'error')
+                return redirect(request.url)
+
+            except psycopg2.Error as e:
+                conn.rollback()
+                print("POSTGRES ERROR:", e)
+                flash(f'Database error: {e.pgerror}', 'error')
+                return redirect(request.url)
+
+            except OSError as e:
+                conn.rollback()
                 print("Photo upload error:", e)
-                photo_filename = None
+                flash('The photo could not be saved.', 'error')
+                return redirect(request.url)
 
-        # ---------- VALIDATION ----------
-        if not name:
-            flash('Name is required.', 'error')
-            return redirect(request.url)
 
-        if len(usn) != 10:
-            flash('USN must be exactly 10 characters.', 'error')
-            return redirect(request.url)
+    return render_template('data_entry.html')
 
-        if not phone.isdigit() or len(phone) != 10:
-            flash('Phone number must be exactly 10 digits.', 'error')
+@app.route('/bulk-import', methods=['GET', 'POST'])
+def bulk_import():
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('students_file')
+        if not upload or not upload.filename.lower().endswith(('.csv', '.xlsx')):
+            flash('Please upload a .csv or .xlsx file.', 'error')
             return redirect(request.url)
 
-        # ---------- DATABASE ----------
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-
-            cur.execute("""
-                INSERT INTO students
-                (name, dob, mother_name, father_name, branch, semester,
-                 usn, phone, email, photo_path, sports, blood_group, gender)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                name, dob, mother_name, father_name, branch, semester,
-                usn, phone, email, photo_filename,
-                sports, blood_group, gender
-            ))
-
-            conn.commit()
-            conn.close()
-            flash('Student saved successfully.', 'success')
-            return redirect(url_for('data_entry'))
-
-        except psycopg2.IntegrityError:
-            conn.rollback()
-            conn.close()
-            flash('USN already exists.', 'error')
-            return redirect(request.url)
+        with pooled_connection() as conn:
+            result = import_students(conn, upload.stream, upload.filename)
+        invalidate_reports(result.updated_ids)
+        if result.file_error:
+            flash(f'{result.file_error} Rows before that were kept: {result.inserted} new and '
+                  f'{result.updated} updated students.', 'error')
+        else:
+            flash(f'Imported {result.inserted} new and updated {result.updated} existing students.', 'success')
 
-        except psycopg2.Error as e:
-            conn.rollback()
-            conn.close()
-            print("POSTGRES ERROR:", e)
-            flash(f'Database error: {e.pgerror}', 'error')
-            return redirect(request.url)
+    return render_template('bulk_import.html', result=result)
 
+@app.cli.command('import-students')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_students_command(path):
+    """Bulk import students from a CSV or XLSX file."""
+    with open(path, 'rb') as f, pooled_connection() as conn:
+        result = import_students(conn, f, path)
+    invalidate_reports(result.updated_ids)
 
-    return render_template('data_entry.html')
+    print(f"Inserted {result.inserted}, updated {result.updated}, rejected {len(result.errors)}")
+    for row_number, usn, message in result.errors:
+        print(f"  row {row_number} ({usn or 'no USN'}): {message}")
+    if result.file_error:
+        print(f"Stopped reading the file early: {result.file_error}")
+
+DATA_VIEW_COLUMNS = ('id', 'name', 'usn', 'dob', 'phone', 'email', 'branch', 'semester', 'sports', 'photo_path')
 
 @app.route('/data-view')
 def data_view():
-    conn = get_db_connection()
-    c = conn.cursor()
+    with pooled_connection() as conn:
+        c = conn.cursor()
 
-    c.execute('SELECT * FROM students ORDER BY id DESC')
-    students = c.fetchall()
-    conn.close()
-    return render_template('data_view.html', students=students)
+        record = student_record(DATA_VIEW_COLUMNS)
+        page = fetch_page(c, f"SELECT {', '.join(record._fields)} FROM students", 'id_desc', request.args)
+    page = page._replace(rows=[record._make(row) for row in page.rows])
+    return render_template('data_view.html', students=page.rows, page=page)
 
 @app.route('/data-edit')
 def data_edit():
-    conn = get_db_connection()
-    c = conn.cursor()
+    with pooled_connection() as conn:
+        c = conn.cursor()
 
-    c.execute('SELECT id, name, usn, phone, email FROM students ORDER BY id DESC')
-    students = c.fetchall()
-    conn.close()
-    return render_template('data_edit.html', students=students)
+        page = fetch_page(c, 'SELECT id, name, usn, phone, email FROM students',
+                          'id_desc', request.args)
+    return render_template('data_edit.html', students=page.rows, page=page)
 
 @app.route('/edit-student/<int:student_id>', methods=['GET', 'POST'])
 def edit_student(student_id):
@@ -209,89 +274,76 @@ def edit_student(student_id):
         blood_group = empty_to_none(request.form.get('blood_group', '').strip())
         gender = empty_to_none(request.form.get('gender', '').strip())
 
-        # ---------- PHOTO (FIXED) ----------
-        photo = request.files.get('photo')
-        photo_filename = None
-
-        if photo and photo.filename:
-            photo_filename = secure_filename(photo.filename)
-            photo_data = photo.read()
-
-            try:
-                if is_s3_enabled():
-                    upload_to_s3(BytesIO(photo_data), photo_filename)
-                else:
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    with open(os.path.join(app.config['UPLOAD_FOLDER'], photo_filename), 'wb') as f:
-                        f.write(photo_data)
-            except Exception as e:
-                print("Photo upload error:", e)
-                photo_filename = None
-        else:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT photo_path FROM students WHERE id=%s", (student_id,))
-            row = cur.fetchone()
-            conn.close()
-            if row:
-                photo_filename = row[0]
-
         # ---------- VALIDATION ----------
-        if not name:
-            flash('Name is required.', 'error')
-            return redirect(request.url)
-
-        if len(usn) != 10:
-            flash('USN must be exactly 10 characters.', 'error')
+        error = validate_student(name, usn, phone)
+        if error:
+            flash(error, 'error')
             return redirect(request.url)
 
-        if not phone.isdigit() or len(phone) != 10:
-            flash('Phone number must be exactly 10 digits.', 'error')
-            return redirect(request.url)
+        # ---------- PHOTO ----------
+        # Named by its SHA-256 and only written to local disk, once per
+        # distinct photo; the upload worker pushes it to storage after the
+        # commit
+        photo_data, photo_filename = read_photo_upload(request.files.get('photo'))
 
         # ---------- DATABASE ----------
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-
-            cur.execute("""
-                UPDATE students SET
-                name=%s, dob=%s, mother_name=%s, father_name=%s,
-                branch=%s, semester=%s, usn=%s, phone=%s, email=%s,
-                photo_path=%s, sports=%s, blood_group=%s, gender=%s
-                WHERE id=%s
-            """, (
-                name, dob, mother_name, father_name,
-                branch, semester, usn, phone, email,
-                photo_filename, sports, blood_group, gender,
-                student_id
-            ))
-
-            conn.commit()
-            conn.close()
-            flash('Student updated successfully.', 'success')
-            return redirect(url_for('data_edit'))
-
-        except psycopg2.IntegrityError:
-            conn.rollback()
-            conn.close()
-            flash('USN already exists.', 'error')
-            return redirect(request.url)
-
-        except psycopg2.Error as e:
-            conn.rollback()
-            conn.close()
-            print("POSTGRES ERROR:", e)
-            flash(f'Database error: {e.pgerror}', 'error')
-            return redirect(request.url)
+        with pooled_connection() as conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT photo_path FROM students WHERE id=%s FOR UPDATE", (student_id,))
+                row = cur.fetchone()
+                old_photo = row[0] if row else None
+
+                # Keep the existing photo when no new one was uploaded
+                cur.execute("""
+                    UPDATE students SET
+                    name=%s, dob=%s, mother_name=%s, father_name=%s,
+                    branch=%s, semester=%s, usn=%s, phone=%s, email=%s,
+                    photo_path=COALESCE(%s, photo_path), sports=%s,
+                    blood_group=%s, gender=%s
+                    WHERE id=%s
+                """, (
+                    name, dob, mother_name, father_name,
+                    branch, semester, usn, phone, email,
+                    photo_filename, sports, blood_group, gender,
+                    student_id
+                ))
+
+                new_photo = dropped = False
+                if photo_filename and photo_filename != old_photo:
+                    new_photo = attach_photo(cur, photo_data, photo_filename)
+                    dropped = bool(old_photo) and drop_photo_ref(cur, old_photo)
+
+                conn.commit()
+                if new_photo:
+                    queue_upload(app, photo_filename)
+                if dropped:
+                    queue_delete(app, old_photo)
+                invalidate_reports([student_id])
+                flash('Student updated successfully.', 'success')
+                return redirect(url_for('data_edit'))
+
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                flash('USN already exists.', 'error')
+                return redirect(request.url)
+
+            except psycopg2.Error as e:
+                conn.rollback()
+                print("POSTGRES ERROR:", e)
+                flash(f'Database error: {e.pgerror}', 'error')
+                return redirect(request.url)
+
+            except OSError as e:
+                conn.rollback()
+                print("Photo upload error:", e)
+                flash('The photo could not be saved.', 'error')
+                return redirect(request.url)
 
 
     # ---------- GET ----------
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM students WHERE id=%s", (student_id,))
-    student = cur.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        student = fetch_student(conn, student_id)
 
     if not student:
         flash('Student not found.', 'error')
@@ -301,41 +353,82 @@ def edit_student(student_id):
 
 @app.route('/delete-student/<int:student_id>', methods=['POST'])
 def delete_student(student_id):
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    c.execute('DELETE FROM students WHERE id = %s', (student_id,))
-    conn.commit()
-    conn.close()
+    with pooled_connection() as conn:
+        c = conn.cursor()
+
+        c.execute('DELETE FROM students WHERE id = %s RETURNING photo_path', (student_id,))
+        row = c.fetchone()
+        # The photo file goes with its last student
+        dropped = bool(row and row[0]) and drop_photo_ref(c, row[0])
+        conn.commit()
+    if dropped:
+        queue_delete(app, row[0])
+    invalidate_reports([student_id])
     flash('Student deleted successfully.', 'success')
     return redirect(url_for('data_edit'))
 
 @app.route('/data-select', methods=['GET', 'POST'])
 def data_select():
-    search_name = ''
     if request.method == 'POST':
         search_name = request.form.get('search_name', '').strip()
-    
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    
-    if search_name:
-        c.execute(
-    'SELECT id, name, usn, phone, email, sports FROM students WHERE name ILIKE %s ORDER BY name',
-    (f'%{search_name}%',)
-)
-
     else:
-        c.execute('SELECT id, name, usn, phone, email, sports FROM students ORDER BY name')
+        # Pagination links carry the search term in the query string
+        search_name = request.args.get('search_name', '').strip()
     
-    students = c.fetchall()
-    conn.close()
-    return render_template('data_select.html', students=students, search_name=search_name)
+    with pooled_connection() as conn:
+        c = conn.cursor()
+
+        if search_name:
+            # Ranked results replace the alphabetical pages while searching
+            students = search_students(conn, search_name, limit=SEARCH_LIMIT)
+            page = Page(students, None, None, SEARCH_LIMIT)
+        else:
+            page = fetch_page(c, 'SELECT id, name, usn, phone, email, sports FROM students',
+                              'name', request.args)
+    return render_template('data_select.html', students=page.rows, page=page,
+                           search_name=search_name)
+
+@app.route('/api/students/search')
+def search_students_api():
+    term = request.args.get('q', '').strip()
+    limit = min(get_page_size({'per_page': request.args.get('limit', SUGGEST_LIMIT)}), SEARCH_LIMIT)
+    if not term:
+        return jsonify([])
+
+    with pooled_connection() as conn:
+        rows = search_students(conn, term, limit=limit, columns='id, name, usn, sports')
+    return jsonify([
+        {'id': row[0], 'name': row[1], 'usn': row[2], 'sports': row[3]}
+        for row in rows
+    ])
 
 @app.route('/report')
 def report():
-    return render_template('report.html')
+    return render_template('report.html', export_columns=EXPORT_COLUMNS)
+
+@app.route('/export')
+def export_students():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unknown export format.', 'error')
+        return redirect(url_for('report'))
+
+    columns = parse_columns(','.join(request.args.getlist('columns')))
+    sql, params = build_export_query(
+        columns,
+        branch=request.args.get('branch', '').strip(),
+        semester=request.args.get('semester', '').strip(),
+        sports=request.args.get('sports', '').strip(),
+    )
+
+    def generate():
+        # The connection is borrowed for as long as the download streams
+        with pooled_connection() as conn:
+            yield from EXPORT_WRITERS[export_format](columns, iter_export_rows(conn, sql, params))
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=students.{export_format}'
+    return response
 
 @app.route('/template-upload', methods=['GET', 'POST'])
 def template_upload():
@@ -351,210 +444,85 @@ def template_upload():
         else:
             flash('Please upload a valid .docx file.', 'error')
     
-    conn = get_db_connection()
-    c = conn.cursor()
+    with pooled_connection() as conn:
+        c = conn.cursor()
 
-    c.execute('SELECT id, name, usn FROM students ORDER BY name')
-    students = c.fetchall()
-    conn.close()
+        page = fetch_page(c, 'SELECT id, name, usn FROM students', 'name', request.args)
     
-    return render_template('template_upload.html', students=students)
+    return render_template('template_upload.html', students=page.rows, page=page)
+
+@app.route('/fill-template', methods=['POST'])
+def fill_template():
+    selected_ids = request.form.getlist('selected_students')
+    output = request.form.get('output', 'merged')
+    template_path = session.get('template_path')
+
+    if not selected_ids or not template_path or not os.path.exists(template_path):
+        flash('Please select students and upload a template first.', 'error')
+        return redirect(url_for('template_upload'))
+
+    with pooled_connection() as conn:
+        students = fetch_students(conn, selected_ids, TEMPLATE_COLUMNS)
+    students.sort(key=lambda student: student.name or '')
+
+    if not students:
+        flash('Selected students were not found.', 'error')
+        return redirect(url_for('template_upload'))
+
+    try:
+        template = compile_template(template_path)
+    except Exception as e:
+        print("TEMPLATE ERROR:", e)
+        flash('The uploaded template could not be read. Please upload a valid .docx file.', 'error')
+        return redirect(url_for('template_upload'))
+
+    stem = os.path.splitext(os.path.basename(template_path))[0]
+    buf = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX)
+    if output == 'zip':
+        template.render_zip(students, buf)
+        return send_buffer(buf, f'filled_{stem}.zip', ZIP_MIMETYPE)
+
+    template.render_merged(students, buf)
+    return send_buffer(buf, f'filled_{stem}.docx', DOCX_MIMETYPE)
+
+def wants_pdf(report_format=None):
+    # file_type=pdf on any report form; edited reports pass no format
+    if request.form.get('file_type') != 'pdf':
+        return False
+    return report_format is None or report_format in PDF_FORMATS
+
+def send_new_report(cache_key, doc, download_name, student_ids, all_students=False):
+    # With the cache off nothing is written to the cache directory; the
+    # report goes out from a spooled buffer instead
+    if not REPORT_CACHE_ENABLED:
+        return send_document(doc, download_name)
+    return send_report_file(store_report(cache_key, doc, student_ids, all_students), download_name)
 
 @app.route('/generate-report', methods=['POST'])
 def generate_report():
     selected_ids = request.form.getlist('selected_students')
     report_format = request.form.get('report_format', 'detailed')
+    pdf = wants_pdf(report_format)
     
     if not selected_ids:
         flash('Please select at least one student.', 'error')
         return redirect(url_for('data_select'))
     
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    placeholders = ','.join(['%s'] * len(selected_ids))
-
-
-    query = f'SELECT * FROM students WHERE id IN ({placeholders})'
-    c.execute(query, selected_ids)
-    students = c.fetchall()
-    conn.close()
-    
-    doc = Document()
+    with pooled_connection() as conn:
+        students = fetch_students(conn, selected_ids, report_columns(report_format))
     
-    if report_format == 'vtu_eligibility':
-        from docx.enum.section import WD_ORIENT
-        
-        section = doc.sections[0]
-        section.orientation = WD_ORIENT.LANDSCAPE
-        section.page_width, section.page_height = section.page_height, section.page_width
-        
-        title = doc.add_paragraph()
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = title.add_run('ELIGIBILITYPROFORMA')
-        run.bold = True
-        run.underline = True
-        
-        subtitle = doc.add_paragraph()
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        subtitle.add_run('ELIGIBITY PROFORMA OF PLAYERS REPRESENTING COLLEGE IN VTU INTER-COLLEGIATE SPORTS/TOURNAMENT 2025-26')
-        
-        college_info = doc.add_paragraph()
-        college_info.add_run('COLLEGE NAME & ADDRESS : ')
-        run = college_info.add_run('DAYANANDA SAGAR ACADEMY OF TECHNOLOGY AND MANAGEMENT , BANGALURU 560082')
-        run.underline = True
-        
-        game = doc.add_paragraph()
-        game.add_run('GAME :- ____________')
-        
-        org_college = doc.add_paragraph()
-        org_college.add_run('ORGANISING COLLEGE:- __________________________________DIVISION : Bangalore division _________________')
-        
-        doc.add_paragraph('')
-        
-        
-        table = doc.add_table(rows=len(students)+2, cols=7)
-        table.style = 'Table Grid'
-        
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'A'
-        hdr_cells[1].text = 'B'
-        hdr_cells[2].text = 'C'
-        hdr_cells[3].text = 'D'
-        hdr_cells[4].text = 'E'
-        hdr_cells[5].text = 'F'
-        hdr_cells[6].text = 'G'
-        
-        hdr_cells2 = table.rows[1].cells
-        hdr_cells2[0].text = 'SL NO.'
-        hdr_cells2[1].text = 'Student Details'
-        hdr_cells2[2].text = 'Course Details'
-        hdr_cells2[3].text = 'Academic Details'
-        hdr_cells2[4].text = 'VTU Previous'
-        hdr_cells2[5].text = 'Photo'
-        hdr_cells2[6].text = 'Signature'
-        
-        for i, student in enumerate(students):
-            row_cells = table.rows[i+2].cells
-            row_cells[0].text = str(i+1)
-            row_cells[1].text = f'Name: {student[1] or ""}\nFather: {student[4] or ""}\nMother: {student[3] or ""}\nBranch: {student[5] or ""}\nUSN: {student[6] or ""}'
-            row_cells[2].text = f'Course: {student[5] or ""}\nDuration: 4 Years\nDOB: {student[2] or ""}\nContact: {student[7] or ""}'
-            row_cells[3].text = 'PUC Date: ___\nFirst Admission: ___\nCurrent Admission: ___'
-            row_cells[4].text = f'Game: {student[10] or ""}\nYear: ___'
-            
-            if student[9]:
-                photo_path = os.path.join(app.config['UPLOAD_FOLDER'], student[9])
-                if os.path.exists(photo_path):
-                    try:
-                        paragraph = row_cells[5].paragraphs[0]
-                        run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
-                        run.add_picture(photo_path, width=Inches(1), height=Inches(1.3))
-                    except:
-                        row_cells[5].text = 'Photo Available'
-                else:
-                    row_cells[5].text = 'Photo Not Found'
-            else:
-                row_cells[5].text = 'No Photo'
-            
-            row_cells[6].text = ''
-    
-    elif report_format == 'hod_bonafide':
-        for student in students:
-            for i in range(4):
-                doc.add_paragraph('')
-            
-            content = f'This is to certify that Mr/Ms {student[1] or "____________________________"} is a student of {student[5] or "___________________________"} department studying in _____________ Semester Bearing USN {student[6] or "_____________________________"} for academic year \n20__-20__.And his/her present attendance is _________% he/she can/can\'t take part in sports activity on __/__/____ to__/__/____.'
-            para = doc.add_paragraph(content)
-            for run in para.runs:
-                run.font.size = Inches(14/72)
-            
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            
-            sig_para = doc.add_paragraph('Physical Education Director            Head of the Department')
-            for run in sig_para.runs:
-                run.font.size = Inches(14/72)
-            doc.add_page_break()
-    
-    elif report_format == 'tournament_bonafide':
-        # Space for letterhead
-        for i in range(4):
-            doc.add_paragraph('')
-        
-        to_para = doc.add_paragraph('To .')
-        to_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        to_para.paragraph_format.left_indent = Inches(0)
-        for run in to_para.runs:
-            run.font.size = Inches(11/72)
-        
-        for i in range(3):
-            doc.add_paragraph('')
-        
-        sub_para = doc.add_paragraph()
-        sub_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        sub_para.paragraph_format.left_indent = Inches(0)
-        sub_run = sub_para.add_run('Sub : List of Students participating in ______________(game ) tournament .')
-        sub_run.font.size = Inches(11/72)
-        sub_run.bold = True
-        
-        doc.add_paragraph('')
-        
-        ref_para = doc.add_paragraph('With reference to the above subject , I wish to state that the following Bonafide students of our college will be participating in _____________________________________ tournament .')
-        ref_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        ref_para.paragraph_format.left_indent = Inches(0)
-        for run in ref_para.runs:
-            run.font.size = Inches(11/72)
-        
-        doc.add_paragraph('')
-        
-        req_para = doc.add_paragraph('Hence, I request you to kindly permit them and oblige')
-        req_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        req_para.paragraph_format.left_indent = Inches(0)
-        for run in req_para.runs:
-            run.font.size = Inches(11/72)
-        
-        doc.add_paragraph('')
-        
-        table = doc.add_table(rows=len(students)+1, cols=4)
-        table.style = 'Table Grid'
-        
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Sl.No.'
-        hdr_cells[1].text = 'Name'
-        hdr_cells[2].text = 'USN'
-        hdr_cells[3].text = 'Branch'
-        
-        for i, student in enumerate(students):
-            row_cells = table.rows[i+1].cells
-            row_cells[0].text = str(i+1)
-            row_cells[1].text = student[1] or ''
-            row_cells[2].text = student[6] or ''
-            row_cells[3].text = student[5] or ''
-        
-        doc.add_paragraph('')
-        doc.add_paragraph('')
-        
-        sig_table = doc.add_table(rows=1, cols=2)
-        sig_table.columns[0].width = Inches(3)
-        sig_table.columns[1].width = Inches(3)
-        
-        left_cell = sig_table.cell(0, 0)
-        left_para = left_cell.paragraphs[0]
-        left_para.add_run('Physical Education Director')
-        
-        right_cell = sig_table.cell(0, 1)
-        right_para = right_cell.paragraphs[0]
-        right_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        right_para.add_run('Principal')
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-    doc.save(temp_file.name)
-    temp_file.close()
+    download_name = report_filename(report_format, pdf=pdf)
+    cache_key = report_cache_key(report_format, students, extra='pdf' if pdf else '')
+    cached = get_cached_report(cache_key)
+    if cached:
+        return send_report_file(cached, download_name)
+
+    if pdf:
+        doc = build_pdf_report(report_format, students)
+    else:
+        doc = make_report(report_format, students)
     
-    return send_file(temp_file.name, as_attachment=True, download_name=f'{report_format}_report.docx')
+    return send_new_report(cache_key, doc, download_name, [student.id for student in students])
 
 @app.route('/edit-report', methods=['POST'])
 def edit_report():
@@ -565,15 +533,8 @@ def edit_report():
         flash('Please select at least one student.', 'error')
         return redirect(url_for('data_select'))
     
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    placeholders = ','.join(['%s'] * len(selected_ids))
-
-    query = f'SELECT * FROM students WHERE id IN ({placeholders})'
-    c.execute(query, selected_ids)
-    students = c.fetchall()
-    conn.close()
+    with pooled_connection() as conn:
+        students = fetch_students(conn, selected_ids, report_columns('edited'))
     
     report_title = 'HOD BONAFIDE CERTIFICATE'
     report_content = '''This is to certify that Mr/Ms [NAME] is a student of [BRANCH] department studying in _____________ Semester Bearing USN [USN] for academic year 
@@ -596,146 +557,158 @@ def generate_edited_report():
     report_title = request.form.get('report_title')
     report_content = request.form.get('report_content')
     
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    placeholders = ','.join(['%s'] * len(selected_ids))
-    query = f'SELECT * FROM students WHERE id IN ({placeholders})'
-    c.execute(query, selected_ids)
-
-    students = c.fetchall()
-    conn.close()
-    
-    doc = Document()
+    with pooled_connection() as conn:
+        students = fetch_students(conn, selected_ids, report_columns('edited'))
     
-    for student in students:
-        content = report_content
-        content = content.replace('[NAME]', student[1] or '')
-        content = content.replace('[USN]', student[6] or '')
-        content = content.replace('[BRANCH]', student[5] or '')
-        
-        for line in content.split('\n'):
-            doc.add_paragraph(line)
-        
-        doc.add_page_break()
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-    doc.save(temp_file.name)
-    temp_file.close()
+    pdf = wants_pdf()
+    download_name = 'edited_report.pdf' if pdf else 'edited_report.docx'
+    cache_key = report_cache_key('edited', students, extra='pdf' if pdf else '', template=template_hash(report_content))
+    cached = get_cached_report(cache_key)
+    if cached:
+        return send_report_file(cached, download_name)
+
+    if pdf:
+        doc = build_edited_pdf(report_content, students)
+    else:
+        doc = build_edited_report(report_content, students)
     
-    return send_file(temp_file.name, as_attachment=True, download_name='edited_report.docx')
+    return send_new_report(cache_key, doc, download_name, [student.id for student in students])
 
 @app.route('/generate-all-report', methods=['POST'])
 def generate_all_report():
     report_format = request.form.get('report_format', 'detailed')
-    
-    conn = get_db_connection()
-    c = conn.cursor()
+    pdf = wants_pdf(report_format)
 
-    c.execute('SELECT * FROM students ORDER BY name')
-    students = c.fetchall()
-    conn.close()
+    if not pdf and (report_format in STREAMING_FORMATS or report_format in ZIP_FORMATS):
+        return generate_streaming_report(report_format)
+    
+    with pooled_connection() as conn:
+        students = fetch_roster(conn, report_columns(report_format))
     
     if not students:
         flash('No students found to generate report.', 'error')
         return redirect(url_for('report'))
     
-    doc = Document()
-    
-    if report_format == 'hod_bonafide':
-        for student in students:
-            for i in range(5):
-                doc.add_paragraph('')
-            
-            content = f'This is to certify that Mr/Ms {student[1] or "____________________________"} is a student of {student[5] or "___________________________"} department studying in _____________ Semester Bearing USN {student[6] or "_____________________________"} for academic year \n20__-20__.And his/her present attendance is _________% he/she can/can\'t take part in sports activity on __/__/____ to__/__/____.'
-            para = doc.add_paragraph(content)
-            for run in para.runs:
-                run.font.size = Inches(14/72)
-            
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            doc.add_paragraph('')
-            
-            sig_para = doc.add_paragraph('Physical Education Director            Head of the Department')
-            for run in sig_para.runs:
-                run.font.size = Inches(14/72)
-            doc.add_page_break()
-    
-    elif report_format == 'tournament_bonafide':
-        # Space for letterhead
-        for i in range(5):
-            doc.add_paragraph('')
-        
-        to_para = doc.add_paragraph('To .')
-        to_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        to_para.paragraph_format.left_indent = Inches(0)
-        for run in to_para.runs:
-            run.font.size = Inches(11/72)
-        
-        for i in range(3):
-            doc.add_paragraph('')
-        
-        sub_para = doc.add_paragraph()
-        sub_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        sub_para.paragraph_format.left_indent = Inches(0)
-        sub_run = sub_para.add_run('Sub : List of Students participating in ______________(game ) tournament .')
-        sub_run.font.size = Inches(11/72)
-        sub_run.bold = True
-        
-        doc.add_paragraph('')
-        
-        ref_para = doc.add_paragraph('With reference to the above subject , I wish to state that the following Bonafide students of our college will be participating in _____________________________________ tournament .')
-        ref_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        ref_para.paragraph_format.left_indent = Inches(0)
-        for run in ref_para.runs:
-            run.font.size = Inches(11/72)
-        
-        doc.add_paragraph('')
-        
-        req_para = doc.add_paragraph('Hence, I request you to kindly permit them and oblige')
-        req_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        req_para.paragraph_format.left_indent = Inches(0)
-        for run in req_para.runs:
-            run.font.size = Inches(11/72)
-        
-        doc.add_paragraph('')
-        
-        table = doc.add_table(rows=len(students)+1, cols=4)
-        table.style = 'Table Grid'
-        
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Sl.No.'
-        hdr_cells[1].text = 'Name'
-        hdr_cells[2].text = 'USN'
-        hdr_cells[3].text = 'Branch'
-        
-        for i, student in enumerate(students):
-            row_cells = table.rows[i+1].cells
-            row_cells[0].text = str(i+1)
-            row_cells[1].text = student[1] or ''
-            row_cells[2].text = student[6] or ''
-            row_cells[3].text = student[5] or ''
-        
-        doc.add_paragraph('')
-        doc.add_paragraph('')
-        
-        sig_table = doc.add_table(rows=1, cols=2)
-        sig_table.columns[0].width = Inches(3)
-        sig_table.columns[1].width = Inches(3)
-        
-        left_cell = sig_table.cell(0, 0)
-        left_para = left_cell.paragraphs[0]
-        left_para.add_run('Physical Education Director')
-        
-        right_cell = sig_table.cell(0, 1)
-        right_para = right_cell.paragraphs[0]
-        right_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        right_para.add_run('Principal')
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.docx')
-    doc.save(temp_file.name)
-    temp_file.close()
+    download_name = report_filename(report_format, 'complete_', pdf)
+    cache_key = report_cache_key(report_format, students, extra='all:pdf' if pdf else 'all')
+    cached = get_cached_report(cache_key)
+    if cached:
+        return send_report_file(cached, download_name)
+
+    if pdf:
+        doc = build_pdf_report(report_format, students, top_lines=5)
+    else:
+        doc = build_report(report_format, students, top_lines=5)
     
-    return send_file(temp_file.name, as_attachment=True, download_name=f'complete_{report_format}_report.docx')
+    return send_new_report(cache_key, doc, download_name, [], all_students=True)
+
+
+@contextmanager
+def roster_rows(columns):
+    # Whole roster through a server-side cursor, for StreamingReport
+    with pooled_connection() as conn:
+        yield iter_roster(conn, columns)
+
+
+def roster_version():
+    # (row count, digest of every row) computed by Postgres, so the cache can
+    # be checked without pulling the roster into Python
+    with pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT count(*), md5(coalesce(string_agg(s::text, ',' ORDER BY s.id), '')) FROM students s")
+        return c.fetchone()
+
+
+def roster_report(report_format, count, progress=None):
+    # Chunks go to the process pool once there is more than one of them
+    parallel = count > PARALLEL_CHUNK_SIZE
+    columns = report_columns(report_format)
+    open_rows = lambda: roster_rows(columns)
+    if report_format in ZIP_FORMATS:
+        return StudentDocuments(ZIP_FORMATS[report_format], open_rows, 5, count, progress, parallel)
+    return StreamingReport(report_format, open_rows, 5, count, progress, parallel)
+
+
+def generate_streaming_report(report_format):
+    count, digest = roster_version()
+    if not count:
+        flash('No students found to generate report.', 'error')
+        return redirect(url_for('report'))
+
+    download_name = report_filename(report_format, 'complete_')
+    cache_key = report_cache_key(report_format, [], extra=f'all:{digest}')
+    cached = get_cached_report(cache_key)
+    if cached:
+        return send_report_file(cached, download_name)
+
+    doc = roster_report(report_format, count)
+    return send_new_report(cache_key, doc, download_name, [], all_students=True)
+
+
+# ---------- BACKGROUND REPORT JOBS ----------
+def run_report_job(params, progress):
+    report_format = params['report_format']
+    pdf = params.get('pdf', False)
+    if params['scope'] == 'all' and not pdf and (report_format in STREAMING_FORMATS or report_format in ZIP_FORMATS):
+        count, _ = roster_version()
+        return roster_report(report_format, count, progress)
+
+    with pooled_connection() as conn:
+        if params['scope'] == 'all':
+            students = fetch_roster(conn, report_columns(report_format))
+        else:
+            students = fetch_students(conn, params['ids'], report_columns(report_format))
+
+    top_lines = 5 if params['scope'] == 'all' else 4
+    if pdf:
+        return build_pdf_report(report_format, students, top_lines=top_lines, progress=progress)
+    return make_report(report_format, students, top_lines=top_lines, progress=progress)
+
+
+def report_job_status(job):
+    status = dict(job)
+    status['status_url'] = url_for('report_job', job_id=job['id'])
+    status['cancel_url'] = url_for('cancel_report_job', job_id=job['id'])
+    status['download_url'] = url_for('download_report_job', job_id=job['id']) if job['status'] == 'done' else None
+    return status
+
+
+@app.route('/report-jobs', methods=['POST'])
+def create_report_job():
+    report_format = request.form.get('report_format', 'detailed')
+    scope = request.form.get('scope', 'all')
+    selected_ids = request.form.getlist('selected_students')
+
+    if scope != 'all' and not selected_ids:
+        return jsonify({'error': 'Please select at least one student.'}), 400
+
+    pdf = wants_pdf(report_format)
+    params = {'scope': scope, 'report_format': report_format, 'ids': selected_ids, 'pdf': pdf}
+    prefix = 'complete_' if scope == 'all' else ''
+    job_id = submit_job(app, run_report_job, params, report_filename(report_format, prefix, pdf))
+    return jsonify(report_job_status(get_job(job_id))), 202
+
+
+@app.route('/report-jobs/<job_id>')
+def report_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(report_job_status(job))
+
+
+@app.route('/report-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_report_job(job_id):
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(report_job_status(job))
+
+
+@app.route('/report-jobs/<job_id>/download')
+def download_report_job(job_id):
+    job = get_job(job_id)
+    if job is None or job['status'] != 'done':
+        flash('Report is not ready yet.', 'error')
+        return redirect(url_for('report'))
+    return send_file(output_path(job_id), as_attachment=True, download_name=job['download_name'])
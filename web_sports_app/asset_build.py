@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import re
+import urllib.request
+from urllib.parse import urljoin, urlparse
+
+# Third-party files the templates used to load from CDNs, pinned to the
+# versions they linked. Downloaded once into the vendor folder, so later
+# builds (and exam-hall machines with no internet) work offline.
+VENDOR_FILES = {
+    'bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'fontawesome.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+    'poppins.css': 'https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap',
+    'bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+}
+
+# Bundle name -> sources, in load order. "vendor/x" is a VENDOR_FILES entry,
+# anything else a file in the static folder.
+BUNDLES = {
+    'vendor.css': ['vendor/bootstrap.min.css', 'vendor/fontawesome.min.css'],
+    'fonts.css': ['vendor/poppins.css'],
+    'dark-theme.css': ['dark-theme.css'],
+    'vendor.js': ['vendor/bootstrap.bundle.min.js'],
+    'theme.js': ['theme.js'],
+    'selection.js': ['selection.js'],
+}
+
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Files written by the last build, so the next one knows what to keep
+BUILD_FILES_NAME = 'build-files.json'
+VENDOR_DIR = os.environ.get('ASSET_VENDOR_DIR')
+
+# Google Fonts only serves woff2 to browsers it recognises
+_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*(?!!).*?\*/', re.S)
+_LEADING_COMMENTS_RE = re.compile(r'(?:\s*/\*.*?\*/)*\s*', re.S)
+_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_NOT_RE = re.compile(r':not\([^()]*\)')
+_TOKEN_RE = re.compile(r'[\w-]+')
+# class="alert-{{ category }}" in templates, `carousel-item-${dir}` in scripts
+_PREFIX_RE = re.compile(r'([\w-]+-)(?:\{\{|\$\{)')
+
+
+def vendor_dir(static_folder):
+    return VENDOR_DIR or os.path.join(static_folder, 'vendor')
+
+
+def _fetch(url):
+    request = urllib.request.Request(url, headers={'User-Agent': _USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def _vendor_file(folder, name, url):
+    path = os.path.join(folder, name)
+    if not os.path.exists(path):
+        print(f"Downloading {url}")
+        data = _fetch(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _fingerprint(name, data):
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+
+
+def _strip_comments(css):
+    # /*! license banners stay
+    return _COMMENT_RE.sub(lambda m: m.group(1) or '', css)
+
+
+def minify_css(css):
+    css = _strip_comments(css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    # Only drops comment lines, indentation and blank lines, which can't
+    # change what the script does
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def _blocks(css):
+    # Top-level (statements, prelude, body) triples. Statements are the
+    # @charset/@import text between blocks, kept as they are.
+    i = 0
+    while True:
+        start = css.find('{', i)
+        if start < 0:
+            if css[i:].strip():
+                yield css[i:], '', None
+            return
+        depth, j, quote = 1, start + 1, None
+        while depth:
+            char = css[j]
+            if quote:
+                if char == '\\':
+                    j += 1
+                elif char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            j += 1
+        head = css[i:start]
+        # The prelude starts after the last statement and any license banner
+        split = head.rfind(';') + 1
+        split += _LEADING_COMMENTS_RE.match(head, split).end() - split
+        yield head[:split], head[split:].strip(), css[start + 1:j - 1]
+        i = j
+
+
+def _split_selectors(prelude):
+    # Commas inside :not(...)/:is(...) don't separate selectors
+    selectors, depth, last = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and not depth:
+            selectors.append(prelude[last:i])
+            last = i + 1
+    selectors.append(prelude[last:])
+    return [selector.strip() for selector in selectors]
+
+
+def purge_css(css, used, prefixes=()):
+    # Drops selectors naming a class that appears nowhere in the templates or
+    # scripts, and rules left with no selector. @font-face, @keyframes and
+    # selectors without classes are kept.
+    def keep(selector):
+        if '\\' in selector:
+            return True
+        # An unused class inside :not() doesn't stop the selector matching
+        classes = _CLASS_RE.findall(_NOT_RE.sub('', selector))
+        return all(name in used or name.startswith(prefixes) for name in classes)
+
+    out = []
+    for statements, prelude, body in _blocks(css):
+        out.append(statements)
+        if body is None:
+            continue
+        if prelude.startswith(('@media', '@supports', '@layer', '@container')):
+            inner = purge_css(body, used, prefixes)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            out.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [selector for selector in _split_selectors(prelude) if keep(selector)]
+            if selectors:
+                out.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(out)
+
+
+def used_classes(texts):
+    # Every word in the markup and scripts counts as a possible class name.
+    # Over-keeps a little, but never drops a class some page or script sets.
+    used, prefixes = set(), set()
+    for text in texts:
+        used.update(_TOKEN_RE.findall(text))
+        prefixes.update(_PREFIX_RE.findall(text))
+    return used, tuple(sorted(prefixes))
+
+
+def _localize_fonts(css, css_url, folder, fonts):
+    # Fonts referenced by a vendor stylesheet are downloaded next to it and
+    # written to dist/fonts under fingerprinted names
+    def replace(match):
+        url = match.group(2)
+        if url.startswith('data:'):
+            return match.group(0)
+        absolute = urljoin(css_url, url)
+        name = os.path.basename(urlparse(absolute).path)
+        data = _vendor_file(folder, os.path.join('fonts', name), absolute)
+        fingerprinted = _fingerprint(name, data)
+        fonts[fingerprinted] = data
+        return f'url(fonts/{fingerprinted})'
+
+    return _URL_RE.sub(replace, css)
+
+
+def _read_text(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _remove_old_builds(dist, keep):
+    # Anything not from this build or the one before. Pages served before
+    # a deploy still link the previous bundles, so those stay one more build.
+    previous = os.path.join(dist, BUILD_FILES_NAME)
+    try:
+        with open(previous) as f:
+            keep = set(keep) | set(json.load(f))
+    except FileNotFoundError:
+        # No record of earlier builds; leave their files alone this time
+        return
+    for root, _, names in os.walk(dist):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), dist)
+            if relative not in keep and relative not in (MANIFEST_NAME, BUILD_FILES_NAME):
+                os.remove(os.path.join(root, name))
+
+
+def build_assets(static_folder, template_folder):
+    # Writes every bundle to static/dist under a content-hashed name, plus
+    # manifest.json mapping bundle names to those files. Returns the manifest.
+    folder = vendor_dir(static_folder)
+    fonts = {}
+    sources = {}
+    for bundle_sources in BUNDLES.values():
+        for source in bundle_sources:
+            if source.startswith('vendor/'):
+                name = source[len('vendor/'):]
+                text = _vendor_file(folder, name, VENDOR_FILES[name]).decode('utf-8')
+                if name.endswith('.css'):
+                    text = _localize_fonts(text, VENDOR_FILES[name], folder, fonts)
+                sources[source] = text
+            else:
+                sources[source] = _read_text(os.path.join(static_folder, source))
+
+    texts = [_read_text(os.path.join(template_folder, name))
+             for name in os.listdir(template_folder) if name.endswith('.html')]
+    texts += [text for source, text in sources.items() if source.endswith('.js')]
+    used, prefixes = used_classes(texts)
+
+    files = {}
+    manifest = {}
+    for bundle, bundle_sources in BUNDLES.items():
+        parts = []
+        for source in bundle_sources:
+            text = sources[source]
+            # .min files are already minified and left as they are
+            minified = '.min.' in source
+            if bundle.endswith('.css'):
+                text = _strip_comments(text) if minified else minify_css(text)
+                text = purge_css(text, used, prefixes)
+            else:
+                text = text if minified else minify_js(text)
+                text = re.sub(r'^//# sourceMappingURL=.*$', '', text, flags=re.M).strip()
+            parts.append(text)
+        data = ('\n' if bundle.endswith('.css') else ';\n').join(parts).encode('utf-8')
+        manifest[bundle] = _fingerprint(bundle, data)
+        files[manifest[bundle]] = data
+    for name, data in fonts.items():
+        files[os.path.join('fonts', name)] = data
+
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    os.makedirs(os.path.join(dist, 'fonts'), exist_ok=True)
+    for name, data in files.items():
+        with open(os.path.join(dist, name), 'wb') as f:
+            f.write(data)
+
+    # Manifest last, so a running app never points at a half-written build
+    _write_json(os.path.join(dist, MANIFEST_NAME), manifest)
+
+    _remove_old_builds(dist, files)
+    _write_json(os.path.join(dist, BUILD_FILES_NAME), sorted(files))
+    return manifest
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from io import BytesIO
+
+from flask import current_app, request, send_file, url_for
+from markupsafe import Markup, escape
+
+from web_sports_app.asset_build import BUNDLES, DIST_FOLDER, MANIFEST_NAME, VENDOR_FILES
+from web_sports_app.photo_uploads import PHOTO_CACHE_CONTROL, is_content_name
+
+# Stylesheets and scripts come from static/dist under content-hashed names
+# (`flask build-assets`), or before a build as /static/theme.js?v=<hash>, so
+# a changed file gets a new URL and every version can be cached forever.
+# Flask's static route already answers If-None-Match/If-Modified-Since with
+# 304 and serves Range requests from the file; this adds the Cache-Control.
+IMMUTABLE_CACHE_CONTROL = PHOTO_CACHE_CONTROL
+# Anything else under /static (photos stored under their upload name, which
+# a later upload can replace) is revalidated against its ETag every time
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Files written by `flask build-assets`: dist/vendor.3f2a9c1d0e4b.css
+_DIST_NAME_RE = re.compile(r'^dist/(?:fonts/)?[\w.-]+\.[0-9a-f]{12}\.\w+$')
+
+_versions = {}  # filename -> (mtime_ns, size, version)
+_versions_lock = threading.Lock()
+_manifest = (None, {})  # (mtime_ns, bundle -> built file)
+
+
+def asset_version(filename):
+    # Hashing is redone only when the file changes, so edits show up
+    # without a restart
+    path = os.path.join(current_app.static_folder, filename)
+    stat = os.stat(path)
+    cached = _versions.get(filename)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    with open(path, 'rb') as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _versions_lock:
+        _versions[filename] = (stat.st_mtime_ns, stat.st_size, version)
+    return version
+
+
+def asset_url(filename):
+    return url_for('static', filename=filename, v=asset_version(filename))
+
+
+def load_manifest():
+    # {} until `flask build-assets` has run. Re-read when a build replaces it.
+    global _manifest
+    path = os.path.join(current_app.static_folder, DIST_FOLDER, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest[0] != mtime:
+        with open(path) as f:
+            _manifest = (mtime, json.load(f))
+    return _manifest[1]
+
+
+def bundle_urls(name):
+    built = load_manifest().get(name)
+    if built:
+        return [url_for('static', filename=f'{DIST_FOLDER}/{built}')]
+    # Not built (a fresh checkout): the unbundled sources, vendor files
+    # from their CDN as before
+    return [
+        VENDOR_FILES[source[len('vendor/'):]] if source.startswith('vendor/') else asset_url(source)
+        for source in BUNDLES[name]
+    ]
+
+
+def asset_tags(name):
+    # {{ asset_tags('vendor.css') }} in templates
+    if name.endswith('.css'):
+        tag = '<link href="{}" rel="stylesheet">'
+    else:
+        tag = '<script src="{}"></script>'
+    return Markup('\n    '.join(tag.format(escape(url)) for url in bundle_urls(name)))
+
+
+def _upload_name(filename):
+    # "uploads/ab/<sha256>.jpg" or "uploads/thumbs/small/ab/<sha256>.jpg.jpg"
+    # -> "ab/<sha256>.jpg"; None outside the upload folder
+    if not filename.startswith('uploads/'):
+        return None
+    parts = filename.split('/')[1:]
+    if parts[0] == 'thumbs' and len(parts) > 2:
+        return os.path.splitext('/'.join(parts[2:]))[0]
+    return '/'.join(parts)
+
+
+def is_immutable(filename, version):
+    if _DIST_NAME_RE.match(filename):
+        return True
+    if version:
+        # A stale ?v= (an old page after a deploy) gets today's bytes, which
+        # must not be cached under the old URL
+        try:
+            return version == asset_version(filename)
+        except OSError:
+            return False
+    return is_content_name(_upload_name(filename))
+
+
+def _static_cache_headers(response):
+    if request.endpoint != 'static' or response.status_code not in (200, 206, 304):
+        return response
+    filename = (request.view_args or {}).get('filename', '')
+    if is_immutable(filename, request.args.get('v')):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def _content_etag(filename):
+    # Content-named photos carry their SHA-256, so the ETag needs no
+    # hashing; thumbnails add their size. None for upload-named photos.
+    name = _upload_name('uploads/' + filename)
+    if not is_content_name(name):
+        return None
+    digest = os.path.splitext(os.path.basename(name))[0]
+    return digest if name == filename else f"{filename.split('/')[1]}-{digest}"
+
+
+def send_photo(storage, filename):
+    # For backends without files on disk (/media): same ETag/304/Range
+    # handling and cache policy as /static
+    etag = _content_etag(filename)
+    if etag and request.if_none_match.contains(etag):
+        # Revalidation of a content-named photo: no need to fetch it at all
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+    else:
+        data = storage.read(filename)
+        response = send_file(
+            BytesIO(data), download_name=os.path.basename(filename), conditional=True,
+            etag=etag or hashlib.sha256(data).hexdigest(),
+        )
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if etag else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def init_assets(app):
+    app.after_request(_static_cache_headers)
@@ -0,0 +1,248 @@
+"""Report generation benchmark.
+
+Fills a throwaway Postgres database with synthetic students (with photos),
+drives the report routes and list pages through Flask's test client and
+prints wall time, peak RSS and output size per case as JSON:
+
+    python -m web_sports_app.benchmark --database-url postgresql://localhost/sports_bench \
+        --sizes 100 1000 10000 --output bench.json
+
+The students table of that database is EMPTIED before every roster size.
+The queries are Postgres specific (pg_trgm, string_agg, server-side
+cursors), so there is no SQLite mode; a disposable local server works:
+
+    docker run --rm -e POSTGRES_PASSWORD=bench -p 5432:5432 postgres:16
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+BRANCHES = ('CSE', 'ISE', 'ECE', 'EEE', 'MECH', 'CIVIL', 'AIML')
+SPORTS = ('Football', 'Cricket', 'Basketball', 'Volleyball', 'Athletics', 'Chess', 'Kabaddi')
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Sneha')
+LAST_NAMES = ('Kumar', 'Sharma', 'Rao', 'Reddy', 'Nair', 'Gowda', 'Iyer', 'Patil', 'Shetty', 'Joshi')
+
+EDITED_CONTENT = (
+    'This is to certify that Mr/Ms [NAME] is a student of [BRANCH] department '
+    'Bearing USN [USN].\n\n\nPhysical Education Director            Head of the Department'
+)
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_photo(seed, size=(900, 1200)):
+    # Camera-sized JPEG with enough detail that it doesn't compress to nothing
+    from PIL import Image
+
+    rng = random.Random(seed)
+    small = Image.new('RGB', (36, 48))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(36 * 48)])
+    buf = BytesIO()
+    small.resize(size, Image.BICUBIC).save(buf, 'JPEG', quality=90)
+    return buf.getvalue()
+
+
+def seed_students(conn, storage, count, photos):
+    from psycopg2.extras import execute_values
+    from web_sports_app.thumbnails import generate_thumbnails
+
+    # A pool of distinct photos shared round-robin, like a real upload folder
+    # would hold one per student but without generating 10k JPEGs per run
+    photo_names = []
+    for n in range(min(photos, count)):
+        name = f'bench_{n:05d}.jpg'
+        if not storage.exists(name):
+            data = make_photo(n)
+            storage.save(data, name)
+            generate_thumbnails(storage, data, name)
+        photo_names.append(name)
+
+    rng = random.Random(count)
+    rows = []
+    for i in range(count):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}'
+        rows.append((
+            name, f'200{rng.randrange(2, 6)}-0{rng.randrange(1, 10)}-1{rng.randrange(10)}',
+            f'Mother {i}', f'Father {i}', rng.choice(BRANCHES), str(rng.randrange(1, 9)),
+            f'1DS{i:07d}', f'9{rng.randrange(10 ** 8, 10 ** 9)}', f'student{i}@example.com',
+            photo_names[i % len(photo_names)] if photo_names else None,
+            ', '.join(rng.sample(SPORTS, 2)), rng.choice(('A+', 'B+', 'O+', 'AB-')), rng.choice(('M', 'F')),
+        ))
+
+    cur = conn.cursor()
+    cur.execute('TRUNCATE students RESTART IDENTITY')
+    execute_values(cur, """
+        INSERT INTO students (name, dob, mother_name, father_name, branch, semester,
+                              usn, phone, email, photo_path, sports, blood_group, gender)
+        VALUES %s
+    """, rows, page_size=1000)
+    conn.commit()
+    cur.execute('ANALYZE students')
+    conn.commit()
+
+
+def cases(student_ids, select_limit):
+    # (case name, method, url, form data)
+    selected = [str(i) for i in student_ids[:select_limit]]
+    yield 'list:data_view', 'GET', '/data-view', None
+    yield 'list:data_edit', 'GET', '/data-edit', None
+    yield 'list:data_select', 'GET', '/data-select', None
+    yield 'list:data_select_search', 'GET', '/data-select?search_name=Kumar', None
+    yield 'api:search', 'GET', '/api/students/search?q=shar', None
+
+    for report_format in ('vtu_eligibility', 'hod_bonafide', 'tournament_bonafide', 'hod_bonafide_zip'):
+        form = {'report_format': report_format, 'selected_students': selected}
+        yield f'generate_report:{report_format}', 'POST', '/generate-report', form
+        yield f'generate_all_report:{report_format}', 'POST', '/generate-all-report', {'report_format': report_format}
+
+    for report_format in ('vtu_eligibility', 'hod_bonafide', 'tournament_bonafide'):
+        form = {'report_format': report_format, 'selected_students': selected, 'file_type': 'pdf'}
+        yield f'generate_report_pdf:{report_format}', 'POST', '/generate-report', form
+        yield f'generate_all_report_pdf:{report_format}', 'POST', '/generate-all-report', {'report_format': report_format, 'file_type': 'pdf'}
+
+    yield 'generate_edited_report', 'POST', '/generate_edited_report', {
+        'selected_students': ','.join(selected), 'report_title': 'Bench', 'report_content': EDITED_CONTENT,
+    }
+
+
+def run_case(app, method, url, data):
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.open(url, method=method, data=data)
+    size = 0
+    # Count the body as it streams instead of buffering it into memory
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return {
+        'status': response.status_code,
+        'wall_s': round(time.perf_counter() - start, 4),
+        'bytes': size,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_isolated(app, method, url, data):
+    # Peak RSS is per process, so each case runs in a forked child to get a
+    # figure of its own. Without fork (Windows) cases share one process.
+    if not hasattr(os, 'fork'):
+        return run_case(app, method, url, data)
+
+    import multiprocessing
+
+    ctx = multiprocessing.get_context('fork')
+    parent_end, child_end = ctx.Pipe(duplex=False)
+
+    def target():
+        from web_sports_app.streaming_docx import shutdown_process_pool
+        try:
+            child_end.send(run_case(app, method, url, data))
+        except Exception as e:
+            child_end.send({'error': repr(e)})
+        finally:
+            shutdown_process_pool()
+
+    process = ctx.Process(target=target)
+    process.start()
+    child_end.close()
+    try:
+        result = parent_end.recv()
+    except EOFError:
+        result = {'error': 'benchmark process died'}
+    process.join()
+    if process.exitcode:
+        result.setdefault('error', f'exit code {process.exitcode}')
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', required=True,
+                        help='throwaway Postgres database; its students table is emptied')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--photos', type=int, default=100, help='distinct photos shared by the roster')
+    parser.add_argument('--select-limit', type=int, default=1000,
+                        help='students sent to the selected-students routes')
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--cache', action='store_true', help='leave the report cache enabled')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    # Everything below reads its configuration at import time
+    workdir = tempfile.mkdtemp(prefix='sports_bench_')
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['REPORT_CACHE_DIR'] = os.path.join(workdir, 'report_cache')
+    if not args.cache:
+        os.environ['REPORT_CACHE_ENABLED'] = '0'
+
+    from web_sports_app.app import app
+    from web_sports_app.db import get_db_connection
+    from web_sports_app.migrations import migrate
+    from web_sports_app.storage import LocalStorage, set_storage
+
+    photo_dir = os.path.join(workdir, 'uploads')
+    app.config['UPLOAD_FOLDER'] = photo_dir
+    storage = LocalStorage(photo_dir)
+    set_storage(storage)
+
+    conn = get_db_connection()
+    migrate(conn)
+    conn.close()
+
+    results = []
+    for count in args.sizes:
+        conn = get_db_connection()
+        with app.app_context():
+            start = time.perf_counter()
+            seed_students(conn, storage, count, args.photos)
+            seed_s = round(time.perf_counter() - start, 2)
+        cur = conn.cursor()
+        cur.execute('SELECT id FROM students ORDER BY id')
+        student_ids = [row[0] for row in cur.fetchall()]
+        conn.close()
+        print(f'seeded {count} students in {seed_s}s', file=sys.stderr)
+
+        for name, method, url, data in cases(student_ids, args.select_limit):
+            if args.only and args.only not in name:
+                continue
+            result = run_isolated(app, method, url, data)
+            result.update(case=name, students=count)
+            results.append(result)
+            print(f"  {name}: {result.get('wall_s')}s {result.get('bytes')} bytes", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'photos': args.photos,
+            'select_limit': args.select_limit,
+            'report_cache': args.cache,
+            'baseline_rss_mb': _peak_rss_mb(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
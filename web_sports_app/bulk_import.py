@@ -0,0 +1,206 @@
+import csv
+import datetime
+import io
+import os
+import zipfile
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from web_sports_app.students import STUDENT_FIELDS, clean_student, validate_student
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+
+# Spreadsheet headers people actually use, mapped onto column names
+HEADER_ALIASES = {
+    'student_name': 'name',
+    'date_of_birth': 'dob',
+    'mother': 'mother_name',
+    'mothers_name': 'mother_name',
+    'father': 'father_name',
+    'fathers_name': 'father_name',
+    'sem': 'semester',
+    'mobile': 'phone',
+    'phone_number': 'phone',
+    'contact': 'phone',
+    'email_id': 'email',
+    'sport': 'sports',
+    'photo': 'photo_path',
+}
+
+# Photos can't come in through a spreadsheet, so an upsert keeps the old one
+IMPORT_FIELDS = tuple(f for f in STUDENT_FIELDS if f != 'photo_path')
+
+UPSERT_SQL = f"""
+    INSERT INTO students ({', '.join(IMPORT_FIELDS)})
+    VALUES %s
+    ON CONFLICT (usn) DO UPDATE SET
+    {', '.join(f'{f} = EXCLUDED.{f}' for f in IMPORT_FIELDS if f != 'usn')}
+    RETURNING id, (xmax = 0) AS inserted
+"""
+
+
+class ImportFileError(Exception):
+    # The file itself can't be read any further (encoding, not a workbook)
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # (row number, usn, message)
+        self.updated_ids = []
+        # Set when reading stopped early; rows before it are still imported
+        self.file_error = None
+
+    @property
+    def total_ok(self):
+        return self.inserted + self.updated
+
+    def add_error(self, row_number, usn, message):
+        self.errors.append((row_number, usn or '', message))
+
+
+def _normalise_header(header):
+    key = str(header or '').strip().lower().replace("'", '')
+    key = '_'.join(key.replace('-', ' ').replace('.', ' ').split())
+    return HEADER_ALIASES.get(key, key)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores phone numbers as floats
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _decode_csv(data):
+    # Excel's plain "CSV" on Windows is cp1252; "CSV UTF-8" has a BOM
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        pass
+    try:
+        return data.decode('cp1252')
+    except UnicodeDecodeError:
+        raise ImportFileError('The file is not UTF-8 or Windows-1252 text. Save it as "CSV UTF-8" and try again.')
+
+
+def _iter_csv(stream):
+    reader = csv.reader(io.StringIO(_decode_csv(stream.read()), newline=''))
+    try:
+        headers = [_normalise_header(h) for h in next(reader, [])]
+        for row in reader:
+            yield dict(zip(headers, row))
+    except csv.Error as e:
+        raise ImportFileError(f'The file is not valid CSV: {e}')
+
+
+def _iter_xlsx(stream):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # Not a zip, a zip without workbook parts, or damaged sheet XML
+    bad_workbook = (zipfile.BadZipFile, KeyError, InvalidFileException, SyntaxError)
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except bad_workbook:
+        raise ImportFileError('The file is not a valid .xlsx workbook.')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [_normalise_header(h) for h in next(rows, ())]
+        for row in rows:
+            yield {h: _cell_text(v) for h, v in zip(headers, row)}
+    except bad_workbook:
+        raise ImportFileError('The workbook is damaged and could not be read to the end.')
+    finally:
+        workbook.close()
+
+
+def iter_student_rows(stream, filename):
+    # Yields (row number as shown in a spreadsheet, raw dict)
+    if filename.lower().endswith('.xlsx'):
+        rows = _iter_xlsx(stream)
+    else:
+        rows = _iter_csv(stream)
+    for index, raw in enumerate(rows, start=2):
+        if not any(str(v).strip() for v in raw.values() if v is not None):
+            continue
+        yield index, raw
+
+
+def _write_batch(conn, batch, result):
+    # batch: usn -> (row number, record). Keyed by USN because one INSERT ...
+    # ON CONFLICT can't touch the same row twice.
+    entries = list(batch.values())
+    values = [tuple(record[f] for f in IMPORT_FIELDS) for _, record in entries]
+    cur = conn.cursor()
+    try:
+        rows = execute_values(cur, UPSERT_SQL, values, page_size=len(values), fetch=True)
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        # Find the offending rows one at a time, keeping the good ones
+        for row_number, record in entries:
+            try:
+                row = execute_values(cur, UPSERT_SQL, [tuple(record[f] for f in IMPORT_FIELDS)], fetch=True)[0]
+                conn.commit()
+                _count(result, row)
+            except psycopg2.Error as e:
+                conn.rollback()
+                result.add_error(row_number, record['usn'], (e.pgerror or str(e)).strip())
+        return
+
+    for row in rows:
+        _count(result, row)
+
+
+def _count(result, row):
+    student_id, inserted = row
+    if inserted:
+        result.inserted += 1
+    else:
+        result.updated += 1
+        result.updated_ids.append(student_id)
+
+
+def import_students(conn, stream, filename, batch_size=IMPORT_BATCH_SIZE):
+    result = ImportResult()
+    batch = {}
+
+    rows = iter_student_rows(stream, filename)
+    while True:
+        try:
+            row_number, raw = next(rows)
+        except StopIteration:
+            break
+        except ImportFileError as e:
+            # Batches already written stay; the rows read so far still go in
+            result.file_error = str(e)
+            break
+
+        record = clean_student(raw)
+        error = validate_student(record['name'], record['usn'], record['phone'])
+        if error:
+            result.add_error(row_number, record['usn'], error)
+            continue
+
+        if record['usn'] in batch:
+            earlier = batch[record['usn']][0]
+            result.add_error(earlier, record['usn'], f'Duplicate USN, replaced by row {row_number}.')
+        batch[record['usn']] = (row_number, record)
+
+        if len(batch) >= batch_size:
+            _write_batch(conn, batch, result)
+            batch = {}
+
+    if batch:
+        _write_batch(conn, batch, result)
+
+    result.errors.sort()
+    return result
@@ -1,7 +1,30 @@
 import os
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
 
-def get_db_connection():
+from web_sports_app.metrics import METRICS_ENABLED, current_endpoint, timer
+
+# ---------- POOL CONFIG ----------
+# One pool per process, shared by request threads, the report job workers
+# (REPORT_JOB_WORKERS), the photo upload workers (PHOTO_UPLOAD_WORKERS) and
+# whole-roster streaming reports, which hold a connection while they stream.
+# Size DB_POOL_MAX for gunicorn --threads plus those workers; beyond that,
+# borrowers wait up to DB_POOL_TIMEOUT seconds for a connection to come back.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_pid = None
+_orphaned_pools = []
+_pool_lock = threading.Lock()
+
+
+def _get_db_url():
     db_url = os.environ.get("DATABASE_URL")
 
     if not db_url:
@@ -9,4 +32,130 @@ def get_db_connection():
             "DATABASE_URL not set. This app is designed to run on Render only."
         )
 
-    return psycopg2.connect(db_url)
+    return db_url
+
+
+class TimedCursor(extensions.cursor):
+    # Only installed with METRICS_ENABLED, so plain cursors pay nothing
+    def execute(self, query, vars=None):
+        with timer('db_query', endpoint=current_endpoint()):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with timer('db_query', endpoint=current_endpoint()):
+            return super().executemany(query, vars_list)
+
+
+def _connect_kwargs():
+    return {'cursor_factory': TimedCursor} if METRICS_ENABLED else {}
+
+
+def get_db_connection():
+    return psycopg2.connect(_get_db_url(), **_connect_kwargs())
+
+
+class WaitingConnectionPool(pg_pool.ThreadedConnectionPool):
+    # ThreadedConnectionPool.getconn raises PoolError as soon as every
+    # connection is out. One semaphore slot per connection makes a burst
+    # queue for a free one instead.
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise pg_pool.PoolError(f"no database connection free after {DB_POOL_TIMEOUT:g}s")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+def get_pool():
+    global _pool, _pool_pid
+
+    # gunicorn forks workers after import, so a pool inherited from the
+    # parent shares sockets with its siblings. Rebuild it in each process.
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            if _pool is not None:
+                # Don't close (or let gc close) the parent's sockets from the child
+                _orphaned_pools.append(_pool)
+            _pool = WaitingConnectionPool(
+                DB_POOL_MIN, DB_POOL_MAX, _get_db_url(), **_connect_kwargs()
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def close_pool():
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    try:
+        status = conn.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(pool):
+    # Stale connections (server restart, idle timeout) are discarded until a
+    # healthy one turns up; after a restart every idle one may be stale, and
+    # once they are gone the pool opens fresh connections.
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("no healthy database connection in the pool")
+
+
+@contextmanager
+def pooled_connection():
+    pool = get_pool()
+    conn = _checkout(pool)
+    broken = False
+    try:
+        yield conn
+    except psycopg2.InterfaceError:
+        broken = True
+        raise
+    finally:
+        if not broken and not conn.closed:
+            try:
+                # Never hand an open transaction to the next borrower
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken or bool(conn.closed))
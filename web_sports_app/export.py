@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from web_sports_app.search import escape_like
+from web_sports_app.students import STUDENT_FIELDS
+
+EXPORT_COLUMNS = ('id',) + STUDENT_FIELDS
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXPORT_FETCH_SIZE = int(os.environ.get('EXPORT_FETCH_SIZE', '1000'))
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def parse_columns(value):
+    if not value:
+        return list(EXPORT_COLUMNS)
+    columns = [c.strip() for c in value.split(',') if c.strip() in EXPORT_COLUMNS]
+    return columns or list(EXPORT_COLUMNS)
+
+
+def build_export_query(columns, branch=None, semester=None, sports=None):
+    # columns must already be checked against EXPORT_COLUMNS
+    conditions = []
+    params = []
+    if branch:
+        conditions.append('branch = %s')
+        params.append(branch)
+    if semester:
+        conditions.append('semester = %s')
+        params.append(semester)
+    if sports:
+        # sports is free text like "Football, Basketball"; % and _ typed
+        # into the filter match themselves
+        conditions.append("sports ILIKE %s ESCAPE '\\'")
+        params.append(f'%{escape_like(sports)}%')
+
+    sql = f"SELECT {', '.join(columns)} FROM students"
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY id'
+    return sql, params
+
+
+def iter_export_rows(conn, sql, params):
+    # Named (server-side) cursor: rows arrive EXPORT_FETCH_SIZE at a time
+    # instead of the whole table landing in memory.
+    cur = conn.cursor(name='students_export')
+    cur.itersize = EXPORT_FETCH_SIZE
+    try:
+        cur.execute(sql, params)
+        for row in cur:
+            yield row
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def csv_chunks(columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(['' if v is None else v for v in row])
+        if buf.tell() >= EXPORT_CHUNK_SIZE:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def jsonl_chunks(columns, rows):
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), default=str) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def xlsx_chunks(columns, rows):
+    # A write-only workbook keeps rows in its own temp file, and the finished
+    # zip is spooled to disk past EXPORT_CHUNK_SIZE, so memory stays flat.
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Students')
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(list(row))
+
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_CHUNK_SIZE) as out:
+        workbook.save(out)
+        out.seek(0)
+        while True:
+            chunk = out.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+EXPORT_WRITERS = {
+    'csv': csv_chunks,
+    'jsonl': jsonl_chunks,
+    'xlsx': xlsx_chunks,
+}
@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+from web_sports_app.metrics import timer
+from web_sports_app.worker_pool import WorkerPool
+
+# Job state lives on the filesystem so any gunicorn worker can answer
+# progress/download requests, whichever worker actually runs the job.
+REPORT_JOB_DIR = os.environ.get(
+    'REPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'sports_report_jobs')
+)
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', '2'))
+REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', '3600'))
+PROGRESS_WRITE_INTERVAL = 0.5
+# A running job touches its .alive file this often, so a job whose worker
+# died (restart, OOM kill) can be told apart from a slow one
+HEARTBEAT_INTERVAL = 5
+REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', str(6 * HEARTBEAT_INTERVAL)))
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _path(job_id, suffix):
+    return os.path.join(REPORT_JOB_DIR, job_id + suffix)
+
+
+def output_path(job_id):
+    return _path(job_id, '.out')
+
+
+def _write_state(job_id, state):
+    os.makedirs(REPORT_JOB_DIR, exist_ok=True)
+    tmp = _path(job_id, f'.json.{os.getpid()}.{threading.get_ident()}')
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, _path(job_id, '.json'))
+
+
+def get_job(job_id):
+    if not _JOB_ID_RE.match(job_id or ''):
+        return None
+    try:
+        with open(_path(job_id, '.json')) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if state['status'] == 'running' and _is_stale(job_id, state):
+        state.update(status='failed', error='The report worker stopped before finishing.',
+                     finished_at=time.time(), updated_at=time.time())
+        _write_state(job_id, state)
+    state['cancel_requested'] = is_cancel_requested(job_id)
+    return state
+
+
+def _is_stale(job_id, state):
+    try:
+        alive = os.path.getmtime(_path(job_id, '.alive'))
+    except OSError:
+        alive = 0
+    return time.time() - max(alive, state['updated_at']) > REPORT_JOB_STALE_SECONDS
+
+
+def _update_job(job_id, **changes):
+    state = get_job(job_id)
+    if state is None:
+        return None
+    state.update(changes)
+    state['updated_at'] = time.time()
+    _write_state(job_id, state)
+    return state
+
+
+def is_cancel_requested(job_id):
+    # A separate flag file, so the worker's progress writes can't clobber it
+    return os.path.exists(_path(job_id, '.cancel'))
+
+
+def cancel_job(job_id):
+    state = get_job(job_id)
+    if state is None:
+        return None
+    if state['status'] in ('queued', 'running'):
+        open(_path(job_id, '.cancel'), 'w').close()
+        state['cancel_requested'] = True
+    return state
+
+
+def cleanup_jobs(max_age=REPORT_JOB_TTL):
+    if not os.path.isdir(REPORT_JOB_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(REPORT_JOB_DIR):
+        path = os.path.join(REPORT_JOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _make_progress(job_id):
+    last_write = [0.0]
+
+    def progress(done, total):
+        if is_cancel_requested(job_id):
+            raise JobCancelled()
+        now = time.monotonic()
+        if done >= total or now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+            last_write[0] = now
+            _update_job(job_id, progress=done, total=total)
+
+    return progress
+
+
+def _heartbeat(job_id, stop):
+    alive = _path(job_id, '.alive')
+    while True:
+        open(alive, 'a').close()
+        os.utime(alive)
+        if stop.wait(HEARTBEAT_INTERVAL):
+            break
+    try:
+        os.remove(alive)
+    except OSError:
+        pass
+
+
+def _remove_partial(tmp):
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+
+
+def _run_job(app, job_id, runner, params):
+    if is_cancel_requested(job_id):
+        _update_job(job_id, status='cancelled')
+        return
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    _update_job(job_id, status='running', started_at=time.time())
+    tmp = output_path(job_id) + '.partial'
+    try:
+        with app.app_context():
+            # runner(params, progress) returns an object with .save(file)
+            doc = runner(params, _make_progress(job_id))
+            with open(tmp, 'wb') as f, timer('report_save', document=type(doc).__name__):
+                doc.save(f)
+            os.replace(tmp, output_path(job_id))
+        _update_job(job_id, status='done', finished_at=time.time())
+    except JobCancelled:
+        _remove_partial(tmp)
+        _update_job(job_id, status='cancelled', finished_at=time.time())
+    except Exception as e:
+        print("REPORT JOB ERROR:", job_id, e)
+        _remove_partial(tmp)
+        _update_job(job_id, status='failed', error=str(e), finished_at=time.time())
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+_pool = WorkerPool(_run_job, REPORT_JOB_WORKERS)
+
+
+def submit_job(app, runner, params, download_name):
+    cleanup_jobs()
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _write_state(job_id, {
+        'id': job_id,
+        'status': 'queued',
+        'progress': 0,
+        'total': None,
+        'error': None,
+        'download_name': download_name,
+        'created_at': now,
+        'updated_at': now,
+    })
+    _pool.put(app, job_id, runner, params)
+    return job_id
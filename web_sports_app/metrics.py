@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from flask import Response, abort, g, request
+
+# Off by default. When off, none of the hooks are installed, cursors and
+# storage aren't wrapped, and timer() hands back a shared no-op.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+# Server-Timing header on every response, readable in browser dev tools
+METRICS_HEADER = os.environ.get('METRICS_HEADER', '1') == '1'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+METRICS = {
+    'http_request_duration_seconds': ('Request latency by route.', LATENCY_BUCKETS),
+    'http_request_db_queries': ('Database queries per request by route.', QUERY_COUNT_BUCKETS),
+    'db_query_duration_seconds': ('Time in cursor.execute by route.', LATENCY_BUCKETS),
+    'storage_operation_duration_seconds': ('Storage backend calls.', LATENCY_BUCKETS),
+    'report_build_duration_seconds': ('Building a report document in memory.', LATENCY_BUCKETS),
+    'report_save_duration_seconds': ('Writing a report file (streamed formats render here).', LATENCY_BUCKETS),
+}
+
+# Per-request totals for the Server-Timing header
+SERVER_TIMING = (
+    ('db_query', 'db'),
+    ('storage_operation', 'storage'),
+    ('report_build', 'report-build'),
+    ('report_save', 'report-save'),
+)
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_histograms = {}  # (metric, labels) -> [count per bucket..., sum, count]
+_current = ContextVar('request_metrics', default=None)
+
+
+class _RequestStats:
+    __slots__ = ('endpoint', 'started', 'queries', 'totals')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.totals = {}
+
+
+def observe(metric, value, **labels):
+    buckets = METRICS[metric][1]
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+def current_endpoint():
+    stats = _current.get()
+    return stats.endpoint if stats is not None else 'background'
+
+
+class _Timer:
+    __slots__ = ('kind', 'labels', 'started')
+
+    def __init__(self, kind, labels):
+        self.kind = kind
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        observe(f'{self.kind}_duration_seconds', elapsed, **self.labels)
+        stats = _current.get()
+        if stats is not None:
+            stats.totals[self.kind] = stats.totals.get(self.kind, 0.0) + elapsed
+            if self.kind == 'db_query':
+                stats.queries += 1
+        return False
+
+
+def timer(kind, **labels):
+    # with timer('report_build', format='hod_bonafide'): ...
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Timer(kind, labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def render_metrics():
+    # Prometheus text format. Counts are per process; with several gunicorn
+    # workers, each scrape sees whichever worker answered.
+    with _lock:
+        snapshot = {key: list(series) for key, series in _histograms.items()}
+
+    lines = []
+    for metric, (help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, labels), series in sorted(snapshot.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(buckets, series):
+                lines.append(f'{metric}_bucket{{{_labels(labels + (("le", bound),))}}} {count}')
+            lines.append(f'{metric}_bucket{{{_labels(labels + (("le", "+Inf"),))}}} {series[-1]}')
+            suffix = f'{{{_labels(labels)}}}' if labels else ''
+            lines.append(f'{metric}_sum{suffix} {series[-2]:.6f}')
+            lines.append(f'{metric}_count{suffix} {series[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _start_request():
+    # Unmatched URLs share one label so scanners can't blow up cardinality
+    stats = _RequestStats(request.endpoint or 'unmatched')
+    g.metrics_token = _current.set(stats)
+
+
+def _finish_request(response):
+    stats = _current.get()
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats.started
+    observe('http_request_duration_seconds', elapsed,
+            endpoint=stats.endpoint, method=request.method, status=response.status_code)
+    observe('http_request_db_queries', stats.queries, endpoint=stats.endpoint)
+
+    if METRICS_HEADER:
+        timings = [f'app;dur={elapsed * 1000:.1f}']
+        for kind, name in SERVER_TIMING:
+            if kind in stats.totals:
+                entry = f'{name};dur={stats.totals[kind] * 1000:.1f}'
+                if kind == 'db_query':
+                    entry += f';desc="{stats.queries} queries"'
+                timings.append(entry)
+        response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
+
+def _end_request(exc):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        _current.reset(token)
+
+
+def init_metrics(app):
+    @app.route('/metrics')
+    def metrics():
+        if not METRICS_ENABLED:
+            abort(404)
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    if METRICS_ENABLED:
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.teardown_request(_end_request)
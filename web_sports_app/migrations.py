@@ -0,0 +1,195 @@
+import os
+
+import psycopg2
+
+from web_sports_app.search import create_search_indexes
+
+# Held while migrating so two processes starting together don't both run
+# the same DDL. Any constant works as long as nothing else uses it.
+MIGRATION_LOCK_ID = 4210571
+
+# With AUTO_MIGRATE=0 startup only warns about a stale schema, for
+# deployments that run `flask migrate` as a release step
+AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+
+
+def _create_students(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS students (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        dob TEXT,
+        mother_name TEXT,
+        father_name TEXT,
+        branch TEXT,
+        semester TEXT,
+        usn VARCHAR(10) UNIQUE,
+        phone VARCHAR(10),
+        email TEXT,
+        photo_path TEXT,
+        sports TEXT,
+        blood_group TEXT,
+        gender TEXT
+    )
+    """)
+
+
+def _legacy_columns(cur):
+    # Tables created by older versions: blood_group/gender came later, and
+    # the first schema had one branch_sem column instead of branch and
+    # semester. branch_sem is copied into branch and left in place.
+    for column in ('branch', 'semester', 'blood_group', 'gender'):
+        cur.execute(f'ALTER TABLE students ADD COLUMN IF NOT EXISTS {column} TEXT')
+
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'students' AND column_name = 'branch_sem'
+    """)
+    if cur.fetchone():
+        cur.execute("UPDATE students SET branch = branch_sem WHERE branch IS NULL AND branch_sem IS NOT NULL")
+
+
+def _search_indexes(cur):
+    create_search_indexes(cur)
+
+
+def _lookup_indexes(cur):
+    # usn already has the index behind its UNIQUE constraint. (name, id) is
+    # the keyset order of the alphabetical list pages and roster reports.
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS students_branch_idx ON students (branch)",
+        "CREATE INDEX IF NOT EXISTS students_semester_idx ON students (semester)",
+        "CREATE INDEX IF NOT EXISTS students_sports_idx ON students (sports)",
+        "CREATE INDEX IF NOT EXISTS students_lower_name_idx ON students (lower(name))",
+        "CREATE INDEX IF NOT EXISTS students_name_id_idx ON students (name, id)",
+    ):
+        cur.execute(sql)
+
+
+def _updated_at(cur):
+    cur.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+    cur.execute("CREATE INDEX IF NOT EXISTS students_updated_at_idx ON students (updated_at)")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION students_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS students_updated_at ON students")
+    cur.execute("""
+        CREATE TRIGGER students_updated_at BEFORE UPDATE ON students
+        FOR EACH ROW EXECUTE FUNCTION students_touch_updated_at()
+    """)
+
+
+def _photos(cur):
+    # One row per stored photo with the number of students using it, so
+    # identical uploads share a file and deleting a student knows when the
+    # file can go. status is pending/stored/failed for the photo upload
+    # worker; photos from before it went up synchronously.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS photos (
+        name TEXT PRIMARY KEY,
+        ref_count INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'stored',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """)
+    cur.execute("""
+        INSERT INTO photos (name, ref_count)
+        SELECT photo_path, count(*)
+        FROM students
+        WHERE photo_path IS NOT NULL AND photo_path <> ''
+        GROUP BY photo_path
+        ON CONFLICT (name) DO NOTHING
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS photos_unfinished_idx ON photos (name)
+        WHERE status IN ('pending', 'failed')
+    """)
+
+
+# Append only: a deployed database records the versions it has run, so
+# existing entries must never be edited or reordered.
+MIGRATIONS = [
+    (1, 'create students', _create_students),
+    (2, 'legacy columns', _legacy_columns),
+    (3, 'search indexes', _search_indexes),
+    (4, 'lookup indexes', _lookup_indexes),
+    (5, 'updated_at', _updated_at),
+    (6, 'photos', _photos),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """)
+    conn.commit()
+    cur.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return versions
+
+
+def schema_version(conn):
+    # Newest applied version, 0 for a database that was never migrated.
+    # Read only, so it is cheap enough for every process start.
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT coalesce(max(version), 0) FROM schema_migrations")
+        version = cur.fetchone()[0]
+    except psycopg2.errors.UndefinedTable:
+        version = 0
+    conn.rollback()
+    return version
+
+
+def ensure_schema(conn):
+    # Startup check: a single SELECT when the schema is current, DDL only
+    # when it is behind
+    version = schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return
+    if not AUTO_MIGRATE:
+        print(f"Database schema is at version {version}, expected {SCHEMA_VERSION}. "
+              "Run: flask --app web_sports_app.app migrate")
+        return
+    migrate(conn)
+
+
+def migrate(conn):
+    # Runs every migration the database hasn't seen yet, each in its own
+    # transaction, and returns the versions applied.
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        done = applied_versions(conn)
+        applied = []
+        for version, name, run in MIGRATIONS:
+            if version in done:
+                continue
+            try:
+                run(conn.cursor())
+                conn.cursor().execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name)
+                )
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version}: {name}")
+            applied.append(version)
+        return applied
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
@@ -0,0 +1,111 @@
+import base64
+import json
+from collections import namedtuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Keyset orderings. "positions" says where the key columns sit in the
+# selected row, so every SELECT used with an ordering must include them.
+# "types" are what a cursor must hold for each column.
+ORDERINGS = {
+    'name': {'columns': ('name', 'id'), 'positions': (1, 0), 'types': (str, int), 'desc': False},
+    'id_desc': {'columns': ('id',), 'positions': (0,), 'types': (int,), 'desc': True},
+}
+
+Page = namedtuple('Page', ['rows', 'next_cursor', 'prev_cursor', 'page_size'])
+
+
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(key, list) or not key:
+        return None
+    return key
+
+
+def _matches(key, types):
+    # bool is an int to isinstance, but never a valid id
+    return len(key) == len(types) and all(
+        isinstance(value, kind) and not isinstance(value, bool)
+        for value, kind in zip(key, types)
+    )
+
+
+def get_page_size(args):
+    try:
+        size = int(args.get('per_page', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _row_key(row, positions):
+    return [row[p] for p in positions]
+
+
+def fetch_page(cur, select_sql, ordering, args, where=None, params=()):
+    # select_sql is "SELECT ... FROM students"; where is an optional extra
+    # condition ANDed with the keyset predicate.
+    order = ORDERINGS[ordering]
+    columns = order['columns']
+    page_size = get_page_size(args)
+
+    after = decode_cursor(args.get('after'))
+    before = None if after else decode_cursor(args.get('before'))
+    cursor_key = after or before
+    # A tampered or stale cursor shows the first page, like a malformed one
+    if cursor_key is not None and not _matches(cursor_key, order['types']):
+        after = before = cursor_key = None
+
+    backwards = before is not None
+    # Walking forward on a DESC ordering means going "down" the key
+    descending = order['desc'] != backwards
+
+    conditions = []
+    query_params = list(params)
+    if where:
+        conditions.append(f'({where})')
+    if cursor_key is not None:
+        op = '<' if descending else '>'
+        conditions.append(f"({', '.join(columns)}) {op} ({', '.join(['%s'] * len(columns))})")
+        query_params.extend(cursor_key)
+
+    direction = 'DESC' if descending else 'ASC'
+    sql = select_sql
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY ' + ', '.join(f'{c} {direction}' for c in columns)
+    sql += ' LIMIT %s'
+    query_params.append(page_size + 1)
+
+    cur.execute(sql, query_params)
+    rows = cur.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first = encode_cursor(_row_key(rows[0], order['positions']))
+        last = encode_cursor(_row_key(rows[-1], order['positions']))
+        if backwards:
+            next_cursor = last
+            prev_cursor = first if has_more else None
+        else:
+            next_cursor = last if has_more else None
+            prev_cursor = first if cursor_key is not None else None
+
+    return Page(rows, next_cursor, prev_cursor, page_size)
@@ -0,0 +1,194 @@
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from web_sports_app.reports import (
+    HOD_SIGNATURE,
+    REPORT_FORMATS,
+    TOURNAMENT_COLUMNS,
+    TOURNAMENT_REFERENCE,
+    TOURNAMENT_REQUEST,
+    TOURNAMENT_SUBJECT,
+    TOURNAMENT_TO,
+    VTU_COLLEGE,
+    VTU_COLLEGE_LABEL,
+    VTU_COLUMNS,
+    VTU_GAME,
+    VTU_HEADERS,
+    VTU_ORGANISER,
+    VTU_SUBTITLE,
+    VTU_TITLE,
+    fill_edited_content,
+    hod_bonafide_text,
+    tournament_row_text,
+    vtu_row_text,
+)
+from web_sports_app.storage import get_storage
+from web_sports_app.thumbnails import read_embed_image
+
+# Same layouts as reports.py, drawn straight to PDF with reportlab so staff
+# don't have to open every .docx in Word to print it.
+PDF_FORMATS = REPORT_FORMATS
+
+BODY = ParagraphStyle('body', fontName='Helvetica', fontSize=11, leading=14)
+CERTIFICATE = ParagraphStyle('certificate', parent=BODY, fontSize=14, leading=20)
+CENTERED = ParagraphStyle('centered', parent=BODY, alignment=TA_CENTER)
+RIGHT = ParagraphStyle('right', parent=BODY, alignment=TA_RIGHT)
+CELL = ParagraphStyle('cell', parent=BODY, fontSize=9, leading=11)
+
+GRID = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+
+def _para(text, style=BODY):
+    return Paragraph(escape(text).replace('\n', '<br/>'), style)
+
+
+def _blank(style=BODY, lines=1):
+    # An empty Word paragraph
+    return Spacer(1, style.leading * lines)
+
+
+class _Progress(Flowable):
+    # Zero-size marker placed after each student, so progress (and job
+    # cancellation) follows the actual drawing rather than story building
+
+    def __init__(self, progress, done, total):
+        super().__init__()
+        self.progress, self.done, self.total = progress, done, total
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.progress(self.done, self.total)
+
+
+def _mark(story, progress, done, total):
+    if progress is not None:
+        story.append(_Progress(progress, done, total))
+
+
+def vtu_eligibility_story(students, progress=None):
+    story = [
+        Paragraph(f'<u><b>{escape(VTU_TITLE)}</b></u>', CENTERED),
+        _para(VTU_SUBTITLE, CENTERED),
+        Paragraph(f'{escape(VTU_COLLEGE_LABEL)}<u>{escape(VTU_COLLEGE)}</u>', BODY),
+        _para(VTU_GAME),
+        _para(VTU_ORGANISER),
+        _blank(),
+    ]
+
+    rows = [list(VTU_HEADERS), list(VTU_COLUMNS)]
+    storage = get_storage()
+    for i, student in enumerate(students):
+        row = [_para(text, CELL) for text in vtu_row_text(str(i+1), student)]
+
+        if student.photo_path:
+            photo_data = read_embed_image(storage, student.photo_path)
+            if photo_data:
+                try:
+                    # reportlab embeds identical image data only once
+                    row.append(Image(BytesIO(photo_data), width=1 * inch, height=1.3 * inch))
+                except Exception:
+                    row.append(_para('Photo Available', CELL))
+            else:
+                row.append(_para('Photo Not Found', CELL))
+        else:
+            row.append(_para('No Photo', CELL))
+
+        row.append('')
+        rows.append(row)
+
+    widths = [0.6, 2.0, 1.8, 1.6, 1.3, 1.2, 1.19]
+    story.append(Table(rows, colWidths=[w * inch for w in widths], repeatRows=2, style=GRID))
+    # One table: progress is reported as it finishes
+    _mark(story, progress, len(students), len(students))
+    return story
+
+
+def hod_bonafide_story(students, top_lines=4, progress=None):
+    story = []
+    for i, student in enumerate(students):
+        if i:
+            story.append(PageBreak())
+        story.append(_blank(lines=top_lines))
+        story.append(_para(hod_bonafide_text(student), CERTIFICATE))
+        story.append(_blank(lines=5))
+        story.append(_para(HOD_SIGNATURE, CERTIFICATE))
+        _mark(story, progress, i + 1, len(students))
+    return story
+
+
+def tournament_bonafide_story(students, top_lines=4, progress=None):
+    story = [
+        _blank(lines=top_lines),
+        _para(TOURNAMENT_TO),
+        _blank(lines=3),
+        Paragraph(f'<b>{escape(TOURNAMENT_SUBJECT)}</b>', BODY),
+        _blank(),
+        _para(TOURNAMENT_REFERENCE),
+        _blank(),
+        _para(TOURNAMENT_REQUEST),
+        _blank(),
+    ]
+
+    rows = [list(TOURNAMENT_COLUMNS)]
+    rows.extend([_para(text, CELL) for text in tournament_row_text(str(i+1), student)]
+                for i, student in enumerate(students))
+    widths = [0.8, 2.6, 1.4, 1.7]
+    story.append(Table(rows, colWidths=[w * inch for w in widths], repeatRows=1, style=GRID))
+    _mark(story, progress, len(students), len(students))
+
+    story.append(_blank(lines=2))
+    story.append(Table([[_para('Physical Education Director'), _para('Principal', RIGHT)]],
+                       colWidths=[3 * inch, 3 * inch]))
+    return story
+
+
+def edited_story(report_content, students, progress=None):
+    story = []
+    for i, student in enumerate(students):
+        if i:
+            story.append(PageBreak())
+        for line in fill_edited_content(report_content, student).split('\n'):
+            story.append(_para(line) if line.strip() else _blank())
+        _mark(story, progress, i + 1, len(students))
+    return story
+
+
+class PdfReport:
+    # .save(file) like a python-docx Document, so the report cache and
+    # background jobs take either. The story is only built when saving.
+
+    def __init__(self, make_story, pagesize=A4):
+        self.make_story = make_story
+        self.pagesize = pagesize
+
+    def save(self, file):
+        doc = SimpleDocTemplate(file, pagesize=self.pagesize, pageCompression=1,
+                                leftMargin=inch, rightMargin=inch,
+                                topMargin=inch, bottomMargin=inch)
+        doc.build(self.make_story())
+
+
+def build_pdf_report(report_format, students, top_lines=4, progress=None):
+    if report_format == 'vtu_eligibility':
+        return PdfReport(lambda: vtu_eligibility_story(students, progress), landscape(A4))
+    if report_format == 'hod_bonafide':
+        return PdfReport(lambda: hod_bonafide_story(students, top_lines, progress))
+    if report_format == 'tournament_bonafide':
+        return PdfReport(lambda: tournament_bonafide_story(students, top_lines, progress))
+    raise ValueError(f'No PDF layout for {report_format}')
+
+
+def build_edited_pdf(report_content, students, progress=None):
+    return PdfReport(lambda: edited_story(report_content, students, progress))
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import time
+from io import BytesIO
+
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+from web_sports_app.db import pooled_connection
+from web_sports_app.storage import get_storage
+from web_sports_app.thumbnails import THUMBNAIL_SIZES, generate_thumbnails, thumbnail_name
+from web_sports_app.worker_pool import WorkerPool
+
+# Form submits only write the photo to local disk. Thumbnails and the push
+# to the storage backend happen on a worker thread, tracked in
+# photos.status; until a push is confirmed, URLs point at the local copy.
+PHOTO_UPLOAD_WORKERS = int(os.environ.get('PHOTO_UPLOAD_WORKERS', '1'))
+PHOTO_UPLOAD_ATTEMPTS = int(os.environ.get('PHOTO_UPLOAD_ATTEMPTS', '5'))
+PHOTO_UPLOAD_BACKOFF = float(os.environ.get('PHOTO_UPLOAD_BACKOFF', '2'))
+
+PENDING = 'pending'
+STORED = 'stored'
+FAILED = 'failed'
+
+# Photos are named by the SHA-256 of their bytes, so identical uploads share
+# one file and a name never points at different content. That makes them
+# safe to cache forever.
+PHOTO_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp', 'BMP': '.bmp'}
+_CONTENT_NAME_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+PHOTO_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# First key of the per-photo advisory lock (the second is the name's hash).
+# Reference changes and the delete worker take it, so a photo being
+# uploaded again can't lose its file to a delete queued before.
+PHOTO_LOCK_ID = 4210572
+
+
+def content_name(data, original_filename=''):
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        with Image.open(BytesIO(data)) as image:
+            extension = PHOTO_EXTENSIONS.get(image.format)
+    except Exception:
+        extension = None
+    if extension is None:
+        extension = os.path.splitext(secure_filename(original_filename))[1].lower() or '.jpg'
+    # Two-character folders keep any one directory from growing huge
+    return f'{digest[:2]}/{digest}{extension}'
+
+
+def is_content_name(filename):
+    # Photos stored before content naming keep their upload filename
+    return bool(_CONTENT_NAME_RE.match(filename or ''))
+
+
+def photo_files(filename):
+    return [filename] + [thumbnail_name(filename, size) for size in THUMBNAIL_SIZES]
+
+
+def lock_photo(cur, filename):
+    # Held until the caller's transaction ends
+    cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (PHOTO_LOCK_ID, filename))
+
+
+def add_photo_ref(cur, filename):
+    # Counts one more student using this photo, inside the caller's
+    # transaction. True when the photo is new and has to be staged.
+    lock_photo(cur, filename)
+    cur.execute("""
+        INSERT INTO photos (name, ref_count, status) VALUES (%s, 1, %s)
+        ON CONFLICT (name) DO UPDATE SET ref_count = photos.ref_count + 1
+        RETURNING ref_count
+    """, (filename, PENDING))
+    return cur.fetchone()[0] == 1
+
+
+def drop_photo_ref(cur, filename):
+    # True when that was the last student using it. Photos the table
+    # doesn't know about (bulk-imported paths) are never deleted.
+    lock_photo(cur, filename)
+    cur.execute("UPDATE photos SET ref_count = ref_count - 1 WHERE name = %s RETURNING ref_count", (filename,))
+    row = cur.fetchone()
+    if row is None or row[0] > 0:
+        return False
+    cur.execute("DELETE FROM photos WHERE name = %s", (filename,))
+    return True
+
+
+def read_photo_upload(photo):
+    # (bytes, content name) of a form upload, or (None, None) without one
+    if not photo or not photo.filename:
+        return None, None
+    data = photo.read()
+    return data, content_name(data, photo.filename)
+
+
+def attach_photo(cur, data, filename):
+    # Adds the reference in the caller's transaction and writes the file
+    # locally if no other student has it. True when it needs queue_upload
+    # after the commit. The photo stays locked until then, so a pending
+    # delete of the same bytes waits and then finds the row.
+    if not add_photo_ref(cur, filename):
+        return False
+    get_storage().stage(data, filename)
+    return True
+
+
+def set_photo_status(filename, status):
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE photos SET status = %s WHERE name = %s", (status, filename))
+        conn.commit()
+
+
+def _push(storage, names):
+    # Thumbnails of a content-named photo are as immutable as the photo
+    cache_control = PHOTO_CACHE_CONTROL if is_content_name(names[0]) else None
+    for attempt in range(PHOTO_UPLOAD_ATTEMPTS):
+        if attempt:
+            time.sleep(PHOTO_UPLOAD_BACKOFF * 2 ** (attempt - 1))
+        try:
+            # Each pass only retries what hasn't gone up yet
+            names = [name for name in names if not storage.push(name, cache_control)]
+        except Exception as e:
+            print(f"Photo upload attempt {attempt + 1} failed: {e}")
+        if not names:
+            return True
+    return False
+
+
+def process_upload(filename):
+    # Thumbnails, push, status. Needs an app context.
+    storage = get_storage()
+    try:
+        data = storage.read(filename)
+    except Exception as e:
+        print(f"Staged photo missing: {filename}: {e}")
+        set_photo_status(filename, FAILED)
+        return False
+
+    names = [filename] + generate_thumbnails(storage, data, filename, stage=True)
+    if not _push(storage, names):
+        # The local copies stay and keep being served
+        print(f"Photo upload gave up after {PHOTO_UPLOAD_ATTEMPTS} attempts: {filename}")
+        set_photo_status(filename, FAILED)
+        return False
+
+    set_photo_status(filename, STORED)
+    for name in names:
+        storage.unstage(name)
+    return True
+
+
+def process_delete(filename):
+    # The same photo may have been uploaded again since its last reference
+    # went; its row is back in that case and the files must stay. The files
+    # go while the photo is locked, so a re-upload can't stage in between.
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            lock_photo(cur, filename)
+            cur.execute("SELECT 1 FROM photos WHERE name = %s", (filename,))
+            if cur.fetchone():
+                return False
+            storage = get_storage()
+            for name in photo_files(filename):
+                storage.delete(name)
+            return True
+        finally:
+            conn.rollback()
+
+
+TASKS = {'upload': process_upload, 'delete': process_delete}
+
+
+def _run_task(app, task, filename):
+    try:
+        with app.app_context():
+            TASKS[task](filename)
+    except Exception as e:
+        print("PHOTO TASK ERROR:", task, filename, e)
+
+
+_pool = WorkerPool(_run_task, PHOTO_UPLOAD_WORKERS)
+
+
+def queue_upload(app, filename):
+    # Call after the transaction that added the photo is committed
+    _pool.put(app, 'upload', filename)
+
+
+def queue_delete(app, filename):
+    # Call after the transaction that dropped the last reference is committed
+    _pool.put(app, 'delete', filename)
+
+
+def unfinished_uploads(conn):
+    # Photos left pending by a restart, or failed after every retry
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM photos WHERE status IN (%s, %s)", (PENDING, FAILED))
+    return [row[0] for row in cur.fetchall()]
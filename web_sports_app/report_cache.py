@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from web_sports_app.metrics import timer
+
+# Generated reports on disk, keyed by everything that affects their bytes.
+# Least recently used files are evicted once the directory exceeds the limit.
+REPORT_CACHE_DIR = os.environ.get(
+    'REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'sports_report_cache')
+)
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', '1') != '0'
+# Leftovers of writes that died midway (.partial files, metadata without its
+# report) are swept by eviction once they are this old
+REPORT_CACHE_STALE_SECONDS = 3600
+
+_evict_lock = threading.Lock()
+_layout_hash = None
+
+
+def layout_hash():
+    # Built-in formats are defined in reports.py (pdf_reports.py for their
+    # PDF versions, streaming_docx.py and template_engine.py for the
+    # whole-roster and per-student paths), so those sources are their template
+    global _layout_hash
+
+    if _layout_hash is None:
+        from web_sports_app import pdf_reports, reports, streaming_docx, template_engine
+        digest = hashlib.sha256()
+        for module in (reports, pdf_reports, streaming_docx, template_engine):
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        _layout_hash = digest.hexdigest()
+    return _layout_hash
+
+
+def report_cache_key(report_format, students, extra='', template=None):
+    # students are the rows the report is built from, in report order;
+    # hashing their contents acts as a per-row version, so an edit can never
+    # be served stale.
+    digest = hashlib.sha256()
+    digest.update(report_format.encode())
+    digest.update(b'\0')
+    digest.update(str(extra).encode())
+    digest.update(b'\0')
+    digest.update((template if template is not None else layout_hash()).encode())
+    digest.update(b'\0')
+    for student in students:
+        digest.update(json.dumps(list(student), default=str).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def template_hash(text):
+    return hashlib.sha256((text or '').encode()).hexdigest()
+
+
+def _paths(key):
+    base = os.path.join(REPORT_CACHE_DIR, key)
+    return base + '.bin', base + '.json'
+
+
+# Both return an open file rather than a path: another worker's eviction or
+# invalidation may remove the entry before it is sent, and an open file
+# survives that.
+
+def get_cached_report(key):
+    if not REPORT_CACHE_ENABLED:
+        return None
+    data_path, _ = _paths(key)
+    try:
+        f = open(data_path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        # mtime doubles as the LRU timestamp
+        os.utime(data_path)
+    except FileNotFoundError:
+        pass
+    return f
+
+
+def store_report(key, doc, student_ids, all_students=False):
+    # Saves doc straight into the cache and returns it opened for sending.
+    # all_students marks entries built from the whole roster. A report
+    # bigger than the whole cache is sent from its temp file, never cached.
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    data_path, meta_path = _paths(key)
+
+    fd, tmp = tempfile.mkstemp(dir=REPORT_CACHE_DIR, suffix='.partial')
+    try:
+        with os.fdopen(fd, 'wb') as out, timer('report_save', document=type(doc).__name__):
+            doc.save(out)
+        f = open(tmp, 'rb')
+        if os.fstat(f.fileno()).st_size > REPORT_CACHE_MAX_BYTES:
+            _remove_file(tmp)
+            return f
+        with open(meta_path, 'w') as meta:
+            json.dump({'ids': sorted(int(i) for i in student_ids), 'all': all_students}, meta)
+        os.replace(tmp, data_path)
+    except BaseException:
+        _remove_file(tmp)
+        raise
+
+    evict_reports(keep=key)
+    return f
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove(key):
+    for path in _paths(key):
+        _remove_file(path)
+
+
+def _sweep_stale(now):
+    names = set(os.listdir(REPORT_CACHE_DIR))
+    for name in names:
+        stale = name.endswith('.partial') or (name.endswith('.json') and name[:-5] + '.bin' not in names)
+        if not stale:
+            continue
+        path = os.path.join(REPORT_CACHE_DIR, name)
+        try:
+            # Another worker may still be writing a fresh one
+            if now - os.stat(path).st_mtime > REPORT_CACHE_STALE_SECONDS:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _entries():
+    if not os.path.isdir(REPORT_CACHE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(REPORT_CACHE_DIR):
+        if not name.endswith('.bin'):
+            continue
+        try:
+            stat = os.stat(os.path.join(REPORT_CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+    return entries
+
+
+def evict_reports(max_bytes=REPORT_CACHE_MAX_BYTES, keep=None):
+    # keep is the entry just stored, which is never the one to go
+    with _evict_lock:
+        if os.path.isdir(REPORT_CACHE_DIR):
+            _sweep_stale(time.time())
+        entries = sorted(_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= max_bytes:
+                break
+            if key == keep:
+                continue
+            _remove(key)
+            total -= size
+
+
+def invalidate_reports(student_ids):
+    # Drop entries containing any of these students, plus every
+    # whole-roster entry since the roster itself changed.
+    if not os.path.isdir(REPORT_CACHE_DIR):
+        return 0
+    changed = {int(i) for i in student_ids}
+    removed = 0
+    for name in os.listdir(REPORT_CACHE_DIR):
+        if not name.endswith('.json'):
+            continue
+        key = name[:-5]
+        try:
+            with open(os.path.join(REPORT_CACHE_DIR, name)) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        if meta.get('all') or changed.intersection(meta.get('ids', [])):
+            _remove(key)
+            removed += 1
+    return removed
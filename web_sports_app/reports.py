@@ -0,0 +1,278 @@
+from io import BytesIO
+
+from docx import Document
+from docx.shared import Inches
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from web_sports_app.metrics import timer
+from web_sports_app.storage import get_storage
+from web_sports_app.thumbnails import read_embed_image
+
+REPORT_FORMATS = ('vtu_eligibility', 'hod_bonafide', 'tournament_bonafide')
+
+# Wording shared by the .docx and PDF layouts
+VTU_TITLE = 'ELIGIBILITYPROFORMA'
+VTU_SUBTITLE = 'ELIGIBITY PROFORMA OF PLAYERS REPRESENTING COLLEGE IN VTU INTER-COLLEGIATE SPORTS/TOURNAMENT 2025-26'
+VTU_COLLEGE_LABEL = 'COLLEGE NAME & ADDRESS : '
+VTU_COLLEGE = 'DAYANANDA SAGAR ACADEMY OF TECHNOLOGY AND MANAGEMENT , BANGALURU 560082'
+VTU_GAME = 'GAME :- ____________'
+VTU_ORGANISER = 'ORGANISING COLLEGE:- __________________________________DIVISION : Bangalore division _________________'
+VTU_HEADERS = ('A', 'B', 'C', 'D', 'E', 'F', 'G')
+VTU_COLUMNS = ('SL NO.', 'Student Details', 'Course Details', 'Academic Details', 'VTU Previous', 'Photo', 'Signature')
+
+HOD_SIGNATURE = 'Physical Education Director            Head of the Department'
+
+TOURNAMENT_TO = 'To .'
+TOURNAMENT_SUBJECT = 'Sub : List of Students participating in ______________(game ) tournament .'
+TOURNAMENT_REFERENCE = 'With reference to the above subject , I wish to state that the following Bonafide students of our college will be participating in _____________________________________ tournament .'
+TOURNAMENT_REQUEST = 'Hence, I request you to kindly permit them and oblige'
+TOURNAMENT_COLUMNS = ('Sl.No.', 'Name', 'USN', 'Branch')
+
+# Columns each layout reads, for student_rows.fetch_students. id leads every
+# set: cache entries and invalidation go by student id.
+CERTIFICATE_COLUMNS = ('id', 'name', 'branch', 'usn')
+REPORT_COLUMNS = {
+    'vtu_eligibility': ('id', 'name', 'dob', 'mother_name', 'father_name', 'branch',
+                        'usn', 'phone', 'photo_path', 'sports'),
+    'hod_bonafide': CERTIFICATE_COLUMNS,
+    'tournament_bonafide': CERTIFICATE_COLUMNS,
+    'edited': CERTIFICATE_COLUMNS,
+}
+
+
+def _report_progress(progress, done, total):
+    # progress(done, total) lets background jobs track and cancel a build
+    if progress is not None:
+        progress(done, total)
+
+
+def vtu_row_text(serial, student):
+    # Text columns of an eligibility row: SL NO. through VTU Previous
+    return [
+        serial,
+        f'Name: {student.name or ""}\nFather: {student.father_name or ""}\nMother: {student.mother_name or ""}\nBranch: {student.branch or ""}\nUSN: {student.usn or ""}',
+        f'Course: {student.branch or ""}\nDuration: 4 Years\nDOB: {student.dob or ""}\nContact: {student.phone or ""}',
+        'PUC Date: ___\nFirst Admission: ___\nCurrent Admission: ___',
+        f'Game: {student.sports or ""}\nYear: ___',
+    ]
+
+
+def add_vtu_eligibility(doc, students, progress=None):
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width, section.page_height = section.page_height, section.page_width
+
+    title = doc.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = title.add_run(VTU_TITLE)
+    run.bold = True
+    run.underline = True
+
+    subtitle = doc.add_paragraph()
+    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    subtitle.add_run(VTU_SUBTITLE)
+
+    college_info = doc.add_paragraph()
+    college_info.add_run(VTU_COLLEGE_LABEL)
+    run = college_info.add_run(VTU_COLLEGE)
+    run.underline = True
+
+    game = doc.add_paragraph()
+    game.add_run(VTU_GAME)
+
+    org_college = doc.add_paragraph()
+    org_college.add_run(VTU_ORGANISER)
+
+    doc.add_paragraph('')
+
+
+    table = doc.add_table(rows=len(students)+2, cols=7)
+    table.style = 'Table Grid'
+
+    for cell, text in zip(table.rows[0].cells, VTU_HEADERS):
+        cell.text = text
+
+    for cell, text in zip(table.rows[1].cells, VTU_COLUMNS):
+        cell.text = text
+
+    storage = get_storage()
+    for i, student in enumerate(students):
+        row_cells = table.rows[i+2].cells
+        for cell, text in zip(row_cells, vtu_row_text(str(i+1), student)):
+            cell.text = text
+
+        if student.photo_path:
+            photo_data = read_embed_image(storage, student.photo_path)
+            if photo_data:
+                try:
+                    paragraph = row_cells[5].paragraphs[0]
+                    run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
+                    run.add_picture(BytesIO(photo_data), width=Inches(1), height=Inches(1.3))
+                except:
+                    row_cells[5].text = 'Photo Available'
+            else:
+                row_cells[5].text = 'Photo Not Found'
+        else:
+            row_cells[5].text = 'No Photo'
+
+        row_cells[6].text = ''
+        _report_progress(progress, i + 1, len(students))
+
+
+def hod_bonafide_text(student):
+    return f'This is to certify that Mr/Ms {student.name or "____________________________"} is a student of {student.branch or "___________________________"} department studying in _____________ Semester Bearing USN {student.usn or "_____________________________"} for academic year \n20__-20__.And his/her present attendance is _________% he/she can/can\'t take part in sports activity on __/__/____ to__/__/____.'
+
+
+def add_hod_bonafide_page(doc, student, top_lines=4):
+    for i in range(top_lines):
+        doc.add_paragraph('')
+
+    para = doc.add_paragraph(hod_bonafide_text(student))
+    for run in para.runs:
+        run.font.size = Inches(14/72)
+
+    doc.add_paragraph('')
+    doc.add_paragraph('')
+    doc.add_paragraph('')
+    doc.add_paragraph('')
+    doc.add_paragraph('')
+
+    sig_para = doc.add_paragraph(HOD_SIGNATURE)
+    for run in sig_para.runs:
+        run.font.size = Inches(14/72)
+    doc.add_page_break()
+
+
+def add_hod_bonafide(doc, students, top_lines=4, progress=None):
+    for i, student in enumerate(students):
+        add_hod_bonafide_page(doc, student, top_lines)
+        _report_progress(progress, i + 1, len(students))
+
+
+def add_tournament_header(doc, top_lines=4):
+    # Space for letterhead
+    for i in range(top_lines):
+        doc.add_paragraph('')
+
+    to_para = doc.add_paragraph(TOURNAMENT_TO)
+    to_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    to_para.paragraph_format.left_indent = Inches(0)
+    for run in to_para.runs:
+        run.font.size = Inches(11/72)
+
+    for i in range(3):
+        doc.add_paragraph('')
+
+    sub_para = doc.add_paragraph()
+    sub_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    sub_para.paragraph_format.left_indent = Inches(0)
+    sub_run = sub_para.add_run(TOURNAMENT_SUBJECT)
+    sub_run.font.size = Inches(11/72)
+    sub_run.bold = True
+
+    doc.add_paragraph('')
+
+    ref_para = doc.add_paragraph(TOURNAMENT_REFERENCE)
+    ref_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    ref_para.paragraph_format.left_indent = Inches(0)
+    for run in ref_para.runs:
+        run.font.size = Inches(11/72)
+
+    doc.add_paragraph('')
+
+    req_para = doc.add_paragraph(TOURNAMENT_REQUEST)
+    req_para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    req_para.paragraph_format.left_indent = Inches(0)
+    for run in req_para.runs:
+        run.font.size = Inches(11/72)
+
+    doc.add_paragraph('')
+
+
+def add_tournament_footer(doc):
+    doc.add_paragraph('')
+    doc.add_paragraph('')
+
+    sig_table = doc.add_table(rows=1, cols=2)
+    sig_table.columns[0].width = Inches(3)
+    sig_table.columns[1].width = Inches(3)
+
+    left_cell = sig_table.cell(0, 0)
+    left_para = left_cell.paragraphs[0]
+    left_para.add_run('Physical Education Director')
+
+    right_cell = sig_table.cell(0, 1)
+    right_para = right_cell.paragraphs[0]
+    right_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    right_para.add_run('Principal')
+
+
+def tournament_row_text(serial, student):
+    return [serial, student.name or '', student.usn or '', student.branch or '']
+
+
+def fill_tournament_row(row_cells, serial, student):
+    for cell, text in zip(row_cells, tournament_row_text(serial, student)):
+        cell.text = text
+
+
+def add_tournament_table(doc, rows):
+    table = doc.add_table(rows=rows, cols=4)
+    table.style = 'Table Grid'
+
+    for cell, text in zip(table.rows[0].cells, TOURNAMENT_COLUMNS):
+        cell.text = text
+    return table
+
+
+def add_tournament_bonafide(doc, students, top_lines=4, progress=None):
+    add_tournament_header(doc, top_lines)
+
+    table = add_tournament_table(doc, len(students)+1)
+
+    for i, student in enumerate(students):
+        fill_tournament_row(table.rows[i+1].cells, str(i+1), student)
+        _report_progress(progress, i + 1, len(students))
+
+    add_tournament_footer(doc)
+
+
+def build_report(report_format, students, top_lines=4, progress=None):
+    # top_lines is the blank space left for the letterhead; the all-students
+    # report has always used one more line than the selected-students one.
+    with timer('report_build', format=report_format):
+        doc = Document()
+
+        if report_format == 'vtu_eligibility':
+            add_vtu_eligibility(doc, students, progress)
+        elif report_format == 'hod_bonafide':
+            add_hod_bonafide(doc, students, top_lines, progress)
+        elif report_format == 'tournament_bonafide':
+            add_tournament_bonafide(doc, students, top_lines, progress)
+
+    return doc
+
+
+def fill_edited_content(report_content, student):
+    content = report_content
+    content = content.replace('[NAME]', student.name or '')
+    content = content.replace('[USN]', student.usn or '')
+    content = content.replace('[BRANCH]', student.branch or '')
+    return content
+
+
+def build_edited_report(report_content, students, progress=None):
+    with timer('report_build', format='edited'):
+        doc = Document()
+
+        for i, student in enumerate(students):
+            content = fill_edited_content(report_content, student)
+
+            for line in content.split('\n'):
+                doc.add_paragraph(line)
+
+            doc.add_page_break()
+            _report_progress(progress, i + 1, len(students))
+
+    return doc
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from flask import send_file
+
+from web_sports_app.metrics import timer
+
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+ZIP_MIMETYPE = 'application/zip'
+PDF_MIMETYPE = 'application/pdf'
+
+# Reports smaller than this never touch the disk. Bigger ones roll over to an
+# anonymous temp file that is removed as soon as it is closed.
+REPORT_SPOOL_MAX = int(os.environ.get('REPORT_SPOOL_MAX', str(16 * 1024 * 1024)))
+
+
+def send_buffer(buf, download_name, mimetype):
+    size = buf.tell()
+    buf.seek(0)
+
+    response = send_file(buf, mimetype=mimetype, as_attachment=True,
+                         download_name=download_name)
+    response.content_length = size
+    # send_file closes the file once the body is sent; make sure it also
+    # happens if the response is dropped before iteration starts.
+    response.call_on_close(buf.close)
+    return response
+
+
+def report_mimetype(download_name):
+    # Reports can also come out as PDF or a zip of per-student documents
+    if download_name.endswith('.zip'):
+        return ZIP_MIMETYPE
+    if download_name.endswith('.pdf'):
+        return PDF_MIMETYPE
+    return DOCX_MIMETYPE
+
+
+def send_document(doc, download_name):
+    # Anything with save(file): python-docx documents, PDF and streamed reports
+    buf = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX)
+    with timer('report_save', document=type(doc).__name__):
+        doc.save(buf)
+    return send_buffer(buf, download_name, report_mimetype(download_name))
+
+
+def send_report_file(f, download_name):
+    # f is an open binary file from the report cache
+    response = send_file(f, mimetype=report_mimetype(download_name), as_attachment=True,
+                         download_name=download_name)
+    response.content_length = os.fstat(f.fileno()).st_size
+    response.call_on_close(f.close)
+    return response
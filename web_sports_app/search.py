@@ -0,0 +1,100 @@
+SEARCH_LIMIT = 100
+SUGGEST_LIMIT = 10
+
+SEARCH_COLUMNS = 'id, name, usn, phone, email, sports'
+
+# Trigram GIN indexes serve ILIKE '%term%' as well as the fuzzy % and <%
+# operators, so none of the search paths below needs a sequential scan.
+TRGM_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS students_name_trgm_idx ON students USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS students_usn_trgm_idx ON students USING gin (usn gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS students_branch_trgm_idx ON students USING gin (branch gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS students_sports_trgm_idx ON students USING gin (sports gin_trgm_ops)",
+]
+PREFIX_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS students_name_prefix_idx ON students (lower(name) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS students_usn_prefix_idx ON students (upper(usn) text_pattern_ops)",
+]
+
+_trgm_available = None
+
+
+def create_search_indexes(cur):
+    # Cursor only: the migration runner owns the transaction, and any error
+    # fails the migration. Servers without the pg_trgm package get the
+    # prefix indexes alone; search then falls back to plain ILIKE.
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if cur.fetchone():
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for sql in TRGM_INDEXES:
+            cur.execute(sql)
+    else:
+        print("pg_trgm is not installed on the server, fuzzy search disabled")
+
+    for sql in PREFIX_INDEXES:
+        cur.execute(sql)
+
+
+def has_trgm(conn):
+    global _trgm_available
+
+    if _trgm_available is None:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _trgm_available = cur.fetchone() is not None
+        conn.rollback()
+    return _trgm_available
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_students(conn, term, limit=SEARCH_LIMIT, columns=SEARCH_COLUMNS):
+    # Ranking: prefix matches on name/USN first, then substring matches on
+    # any searchable column, then typo-tolerant trigram matches on name.
+    term = term.strip()
+    if not term:
+        return []
+
+    like = escape_like(term)
+    params = {
+        'q': term,
+        'prefix': like.lower() + '%',
+        'usn_prefix': like.upper() + '%',
+        'substr': '%' + like + '%',
+        'limit': limit,
+    }
+
+    substring_match = """
+        name ILIKE %(substr)s OR usn ILIKE %(substr)s
+        OR branch ILIKE %(substr)s OR sports ILIKE %(substr)s
+    """
+    tier = f"""
+        CASE
+            WHEN lower(name) LIKE %(prefix)s OR upper(usn) LIKE %(usn_prefix)s THEN 3
+            WHEN {substring_match} THEN 2
+            ELSE 1
+        END
+    """
+
+    if has_trgm(conn):
+        sql = f"""
+            SELECT {columns} FROM students
+            WHERE {substring_match} OR name %% %(q)s OR %(q)s <%% name
+            ORDER BY {tier} DESC,
+                     GREATEST(similarity(name, %(q)s), word_similarity(%(q)s, name)) DESC,
+                     name, id
+            LIMIT %(limit)s
+        """
+    else:
+        sql = f"""
+            SELECT {columns} FROM students
+            WHERE {substring_match}
+            ORDER BY {tier} DESC, name, id
+            LIMIT %(limit)s
+        """
+
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    return cur.fetchall()
@@ -0,0 +1,58 @@
+// Remembers ticked students across paginated pages so a report can cover
+// students selected on several pages.
+function persistentSelection(form, storageKey) {
+    const checkboxes = () => form.querySelectorAll('input[type="checkbox"][name="selected_students"]');
+
+    function load() {
+        try {
+            return new Set(JSON.parse(sessionStorage.getItem(storageKey) || '[]'));
+        } catch (e) {
+            return new Set();
+        }
+    }
+
+    function save(ids) {
+        sessionStorage.setItem(storageKey, JSON.stringify(Array.from(ids)));
+        const counter = document.getElementById('selectedCount');
+        if (counter) counter.textContent = ids.size;
+    }
+
+    function sync() {
+        const ids = load();
+        checkboxes().forEach(checkbox => {
+            if (checkbox.checked) ids.add(checkbox.value);
+            else ids.delete(checkbox.value);
+        });
+        save(ids);
+    }
+
+    function clear() {
+        checkboxes().forEach(checkbox => checkbox.checked = false);
+        save(new Set());
+    }
+
+    const ids = load();
+    checkboxes().forEach(checkbox => {
+        if (ids.has(checkbox.value)) checkbox.checked = true;
+        checkbox.addEventListener('change', sync);
+    });
+    save(ids);
+
+    form.addEventListener('submit', function () {
+        sync();
+        // Report downloads keep the page open, so drop inputs from the last submit
+        form.querySelectorAll('input.carried-selection').forEach(input => input.remove());
+        const onPage = new Set(Array.from(checkboxes()).map(checkbox => checkbox.value));
+        load().forEach(id => {
+            if (onPage.has(id)) return;
+            const input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = 'selected_students';
+            input.value = id;
+            input.className = 'carried-selection';
+            form.appendChild(input);
+        });
+    });
+
+    return { sync: sync, clear: clear };
+}
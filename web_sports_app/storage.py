@@ -0,0 +1,252 @@
+import os
+import threading
+from io import BytesIO
+
+from flask import current_app, url_for
+from werkzeug.security import safe_join
+
+from web_sports_app import cloud_storage
+from web_sports_app.metrics import METRICS_ENABLED, timer
+
+# local | s3 | memory. Defaults to s3 only when a bucket is configured.
+STORAGE_BACKEND = os.environ.get(
+    'STORAGE_BACKEND', 's3' if cloud_storage.AWS_BUCKET_NAME else 'local'
+)
+
+
+def is_safe_name(filename):
+    # Names come from URLs (/media/<path>) as well as the database, so
+    # anything that could leave the storage root ("..", "/etc/passwd") is
+    # refused by every backend
+    return bool(filename) and safe_join('root', filename) is not None
+
+
+def check_name(filename):
+    if not is_safe_name(filename):
+        raise ValueError(f"Unsafe storage name: {filename!r}")
+    return filename
+
+
+class StorageBackend:
+    name = 'base'
+    # True when exists() is a local check rather than a network call
+    cheap_exists = True
+    # True when saved files still have to be pushed somewhere else
+    remote = False
+
+    def save(self, data, filename):
+        raise NotImplementedError
+
+    def read(self, filename):
+        raise NotImplementedError
+
+    def exists(self, filename):
+        raise NotImplementedError
+
+    def delete(self, filename):
+        raise NotImplementedError
+
+    def url(self, filename):
+        raise NotImplementedError
+
+    def local_path(self, filename):
+        # Only backends that keep files on this machine can hand out a path
+        return None
+
+    # Uploads are staged on this machine first and pushed to the backend by
+    # photo_uploads' worker. Local backends store the file when staging.
+    def stage(self, data, filename):
+        self.save(data, filename)
+
+    def push(self, filename, cache_control=None):
+        # True once the backend has its own copy of a staged file
+        return True
+
+    def unstage(self, filename):
+        pass
+
+
+class LocalStorage(StorageBackend):
+    name = 'local'
+
+    def __init__(self, folder=None):
+        self._folder = folder
+
+    @property
+    def folder(self):
+        return self._folder or current_app.config['UPLOAD_FOLDER']
+
+    def local_path(self, filename):
+        return safe_join(self.folder, check_name(filename))
+
+    def save(self, data, filename):
+        path = self.local_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def read(self, filename):
+        with open(self.local_path(filename), 'rb') as f:
+            return f.read()
+
+    def exists(self, filename):
+        return is_safe_name(filename) and os.path.exists(self.local_path(filename))
+
+    def delete(self, filename):
+        try:
+            os.remove(self.local_path(filename))
+        except FileNotFoundError:
+            pass
+
+    def url(self, filename):
+        return url_for('static', filename='uploads/' + filename)
+
+
+class S3Storage(StorageBackend):
+    # Falls back to local disk while S3 is unreachable, same as the old
+    # is_s3_enabled() checks in the routes did.
+    name = 's3'
+    cheap_exists = False
+    remote = True
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback or LocalStorage()
+
+    def save(self, data, filename):
+        check_name(filename)
+        if cloud_storage.is_s3_enabled(wait=True):
+            if cloud_storage.upload_to_s3(BytesIO(data), filename):
+                return
+        self.fallback.save(data, filename)
+
+    def read(self, filename):
+        if self.fallback.exists(filename):
+            return self.fallback.read(filename)
+        check_name(filename)
+        obj = cloud_storage.get_s3_client().get_object(
+            Bucket=cloud_storage.AWS_BUCKET_NAME, Key=f"photos/{filename}"
+        )
+        return obj['Body'].read()
+
+    def exists(self, filename):
+        if not is_safe_name(filename):
+            return False
+        if self.fallback.exists(filename):
+            return True
+        try:
+            cloud_storage.get_s3_client().head_object(
+                Bucket=cloud_storage.AWS_BUCKET_NAME, Key=f"photos/{filename}"
+            )
+            return True
+        except Exception:
+            return False
+
+    def delete(self, filename):
+        self.fallback.delete(check_name(filename))
+        if cloud_storage.is_s3_enabled():
+            try:
+                cloud_storage.get_s3_client().delete_object(
+                    Bucket=cloud_storage.AWS_BUCKET_NAME, Key=f"photos/{filename}"
+                )
+            except Exception as e:
+                print(f"S3 delete failed: {e}")
+
+    def url(self, filename):
+        # A local copy is either staged and not yet confirmed in S3, or was
+        # saved while S3 was down; either way it is the one known to exist
+        if self.fallback.exists(filename):
+            return self.fallback.url(filename)
+        return cloud_storage.get_s3_url(filename)
+
+    def local_path(self, filename):
+        if self.fallback.exists(filename):
+            return self.fallback.local_path(filename)
+        return None
+
+    def stage(self, data, filename):
+        self.fallback.save(data, filename)
+
+    def push(self, filename, cache_control=None):
+        if not cloud_storage.is_s3_enabled(wait=True):
+            return False
+        with open(self.fallback.local_path(filename), 'rb') as f:
+            return cloud_storage.upload_to_s3(f, filename, cache_control) is not None
+
+    def unstage(self, filename):
+        self.fallback.delete(filename)
+
+
+class MemoryStorage(StorageBackend):
+    # Stand-in for tests and local runs without a writable upload folder
+    name = 'memory'
+
+    def __init__(self):
+        self.files = {}
+
+    def save(self, data, filename):
+        self.files[check_name(filename)] = bytes(data)
+
+    def read(self, filename):
+        return self.files[check_name(filename)]
+
+    def exists(self, filename):
+        return is_safe_name(filename) and filename in self.files
+
+    def delete(self, filename):
+        self.files.pop(filename, None)
+
+    def url(self, filename):
+        return url_for('media', filename=filename)
+
+
+BACKENDS = {
+    'local': LocalStorage,
+    's3': S3Storage,
+    'memory': MemoryStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+class InstrumentedStorage:
+    # Times every backend call for /metrics; everything else passes through
+    TIMED_CALLS = ('save', 'read', 'exists', 'delete', 'url', 'local_path', 'stage', 'push', 'unstage')
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if name not in self.TIMED_CALLS:
+            return attr
+
+        def call(*args, **kwargs):
+            with timer('storage_operation', backend=self.backend.name, operation=name):
+                return attr(*args, **kwargs)
+        return call
+
+
+def _instrument(backend):
+    return InstrumentedStorage(backend) if METRICS_ENABLED else backend
+
+
+def get_storage():
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                try:
+                    backend_cls = BACKENDS[STORAGE_BACKEND]
+                except KeyError:
+                    raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+                _storage = _instrument(backend_cls())
+    return _storage
+
+
+def set_storage(backend):
+    global _storage
+
+    with _storage_lock:
+        _storage = _instrument(backend)
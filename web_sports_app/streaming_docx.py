@@ -0,0 +1,347 @@
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from docx import Document
+from lxml import etree
+
+from web_sports_app.reports import (
+    REPORT_COLUMNS,
+    add_hod_bonafide_page,
+    build_report,
+    add_tournament_footer,
+    add_tournament_header,
+    add_tournament_table,
+    fill_tournament_row,
+)
+from web_sports_app.student_rows import STUDENT_COLUMNS
+from web_sports_app.template_engine import document_name
+
+# Formats made of one repeated block per student. vtu_eligibility embeds a
+# picture per row, which needs package parts, so it stays on python-docx.
+STREAMING_FORMATS = ('hod_bonafide', 'tournament_bonafide')
+
+# report_format values that give a zip with one document per student,
+# mapped onto the layout used for each document
+ZIP_FORMATS = {'hod_bonafide_zip': 'hod_bonafide'}
+
+# Large rosters are split into chunks rendered by a pool of processes
+REPORT_PROCESSES = int(os.environ.get('REPORT_PROCESSES', str(os.cpu_count() or 1)))
+PARALLEL_CHUNK_SIZE = int(os.environ.get('PARALLEL_CHUNK_SIZE', '500'))
+
+_MARKER = 'STREAMING-ROWS-GO-HERE'
+_DOCUMENT_XML = 'word/document.xml'
+
+# Private-use characters can't occur in real data, so they make safe slots
+_TOKEN_RE = re.compile('\ue000(\\w+)\ue001')
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_worker_shells = {}
+
+
+def _token(key):
+    return f'\ue000{key}\ue001'
+
+
+# Control characters XML can't hold (pasted from Excel, say) and the token
+# delimiters. python-docx rejects the former with ValueError, exactly as
+# build_report does; escaped as text they would corrupt document.xml.
+_UNSAFE_TEXT_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ue000\ue001]')
+
+
+def _needs_direct_render(student):
+    # python-docx turns these into <w:br/>/<w:tab/> or xml:space="preserve",
+    # which plain text substitution would not reproduce
+    for value in student:
+        if isinstance(value, str) and (
+            value != value.strip() or any(c in value for c in '\n\r\t') or _UNSAFE_TEXT_RE.search(value)
+        ):
+            return True
+    return False
+
+
+def _split_at(xml, tag):
+    # Split the serialized document around the element that holds _MARKER
+    at = xml.index(_MARKER)
+    start = max(m.start() for m in re.finditer(f'<{tag}[ >]', xml[:at]))
+    end = xml.index(f'</{tag}>', at) + len(f'</{tag}>')
+    return xml[:start], xml[end:]
+
+
+class _Shell:
+    # The document around the student blocks, plus a scratch python-docx
+    # document the blocks are rendered on. Not thread safe: one per save(),
+    # or one per worker process.
+
+    def __init__(self, report_format, top_lines):
+        self.top_lines = top_lines
+        self.templates = {}
+
+        doc = Document()
+        if report_format == 'tournament_bonafide':
+            add_tournament_header(doc, top_lines)
+            table = add_tournament_table(doc, 1)
+            marker = table.add_row()
+            marker.cells[0].text = _MARKER
+            add_tournament_footer(doc)
+            marker_element, tag = marker._tr, 'w:tr'
+        else:
+            table = None
+            marker_element, tag = doc.add_paragraph(_MARKER)._p, 'w:p'
+
+        shell = BytesIO()
+        doc.save(shell)
+        marker_element.getparent().remove(marker_element)
+        self.doc, self.table, self.zip = doc, table, shell.getvalue()
+
+        with zipfile.ZipFile(shell) as zf:
+            xml = zf.read(_DOCUMENT_XML).decode('utf-8')
+        self.prefix, self.suffix = _split_at(xml, tag)
+        self._base = None
+
+    def _serialize(self, elements):
+        xml = ''.join(etree.tostring(e, encoding='unicode') for e in elements)
+        # Fragments repeat namespace declarations the root already has
+        for prefix, uri in self.doc.element.nsmap.items():
+            xml = xml.replace(f' xmlns:{prefix}="{uri}"', '')
+        return xml
+
+    def _render_block(self, serial, student):
+        if self.table is not None:
+            row = self.table.add_row()
+            fill_tournament_row(row.cells, serial, student)
+            elements = [row._tr]
+        else:
+            body = self.doc.element.body
+            add_hod_bonafide_page(self.doc, student, self.top_lines)
+            # New paragraphs land just before the trailing sectPr
+            elements = [e for e in body if e is not body.sectPr]
+
+        xml = self._serialize(elements)
+        for element in elements:
+            element.getparent().remove(element)
+        return xml
+
+    def block_xml(self, i, student):
+        # Building every block through python-docx costs milliseconds, so a
+        # block is rendered once per pattern of empty fields (those pick the
+        # "____" defaults) with token placeholders, then filled in as text.
+        if _needs_direct_render(student):
+            return self._render_block(str(i + 1), student)
+
+        pattern = tuple(not value for value in student)
+        template = self.templates.get(pattern)
+        if template is None:
+            sentinel = student._make(value if not value else _token(k) for k, value in enumerate(student))
+            template = self._render_block(_token('serial'), sentinel)
+            self.templates[pattern] = template
+
+        def fill(match):
+            key = match.group(1)
+            value = str(i + 1) if key == 'serial' else str(student[int(key)])
+            return escape(value)
+
+        return _TOKEN_RE.sub(fill, template)
+
+    def document(self, student):
+        # A whole .docx for one student. The parts other than document.xml
+        # are deflated once and reused for every student.
+        if self._base is None:
+            base = BytesIO()
+            with zipfile.ZipFile(BytesIO(self.zip)) as zin, \
+                    zipfile.ZipFile(base, 'w', zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename != _DOCUMENT_XML:
+                        zout.writestr(info, zin.read(info.filename), zipfile.ZIP_DEFLATED)
+            self._base = base.getvalue()
+
+        buf = BytesIO(self._base)
+        buf.seek(0, os.SEEK_END)
+        with zipfile.ZipFile(buf, 'a', zipfile.ZIP_DEFLATED) as zout:
+            xml = self.prefix + self.block_xml(0, student) + self.suffix
+            zout.writestr(_DOCUMENT_XML, xml.encode('utf-8'))
+        return buf.getvalue()
+
+
+def _chunk_xml(shell, start, students):
+    return ''.join(shell.block_xml(start + i, student) for i, student in enumerate(students))
+
+
+def _chunk_documents(shell, start, students):
+    return [shell.document(student) for student in students]
+
+
+def _worker_shell(report_format, top_lines):
+    key = (report_format, top_lines)
+    if key not in _worker_shells:
+        _worker_shells[key] = _Shell(report_format, top_lines)
+    return _worker_shells[key]
+
+
+def _worker_chunk_xml(report_format, top_lines, start, students):
+    return _chunk_xml(_worker_shell(report_format, top_lines), start, students)
+
+
+def _worker_chunk_documents(report_format, top_lines, start, students):
+    return _chunk_documents(_worker_shell(report_format, top_lines), start, students)
+
+
+def get_process_pool():
+    # None when there is only one core to use. Workers are spawned rather
+    # than forked: the web process is threaded and holds DB sockets.
+    global _pool, _pool_pid
+
+    if REPORT_PROCESSES <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(REPORT_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+def _chunks(rows, size):
+    chunk = []
+    start = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+class StreamingReport:
+    # Same .save(file) interface as a python-docx Document, but the student
+    # blocks are rendered from open_rows() a chunk at a time and written
+    # straight into the zip, so memory doesn't grow with the roster.
+    #
+    # Each block is produced by the same reports.py code as the in-memory
+    # path. With parallel=True, chunks are rendered by a process pool and
+    # written back in order.
+
+    def __init__(self, report_format, open_rows, top_lines=4, total=None, progress=None, parallel=False):
+        if report_format not in STREAMING_FORMATS:
+            raise ValueError(f'{report_format} cannot be streamed')
+        self.report_format = report_format
+        self.open_rows = open_rows  # () -> context manager yielding rows
+        self.top_lines = top_lines
+        self.total = total
+        self.progress = progress
+        self.parallel = parallel
+
+    def _rendered_chunks(self, shell, local, worker):
+        # Yields (rows in chunk, result) in roster order
+        pool = get_process_pool() if self.parallel else None
+        with self.open_rows() as rows:
+            if pool is None:
+                for start, chunk in _chunks(rows, PARALLEL_CHUNK_SIZE):
+                    yield chunk, local(shell, start, chunk)
+                return
+
+            # Bounded read-ahead keeps memory flat while every process is busy
+            pending = deque()
+            try:
+                for start, chunk in _chunks(rows, PARALLEL_CHUNK_SIZE):
+                    pending.append((chunk, pool.submit(worker, self.report_format, self.top_lines, start, chunk)))
+                    if len(pending) >= 2 * REPORT_PROCESSES:
+                        chunk, future = pending.popleft()
+                        yield chunk, future.result()
+                while pending:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def _report_progress(self, done):
+        if self.progress is not None:
+            self.progress(done, self.total or done)
+
+    def save(self, file):
+        shell = _Shell(self.report_format, self.top_lines)
+
+        with zipfile.ZipFile(BytesIO(shell.zip)) as zin, \
+                zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                if info.filename != _DOCUMENT_XML:
+                    zout.writestr(info, zin.read(info.filename))
+                    continue
+
+                entry = zipfile.ZipInfo(_DOCUMENT_XML, date_time=info.date_time)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                with zout.open(entry, 'w', force_zip64=True) as out:
+                    out.write(shell.prefix.encode('utf-8'))
+                    done = 0
+                    for chunk, xml in self._rendered_chunks(shell, _chunk_xml, _worker_chunk_xml):
+                        out.write(xml.encode('utf-8'))
+                        done += len(chunk)
+                        self._report_progress(done)
+                    out.write(shell.suffix.encode('utf-8'))
+
+
+class StudentDocuments(StreamingReport):
+    # A zip holding one .docx per student, in the layout of report_format
+
+    def save(self, file):
+        shell = _Shell(self.report_format, self.top_lines)
+        used = set()
+        done = 0
+
+        # Each document is already deflated, so store them as-is
+        with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED) as zout:
+            for chunk, documents in self._rendered_chunks(shell, _chunk_documents, _worker_chunk_documents):
+                for student, data in zip(chunk, documents):
+                    with zout.open(document_name(student, used), 'w', force_zip64=True) as out:
+                        out.write(data)
+                done += len(chunk)
+                self._report_progress(done)
+
+
+@contextmanager
+def _list_rows(students):
+    yield iter(students)
+
+
+def make_report(report_format, students, top_lines=4, progress=None):
+    # Report for rows already in memory: per-student zips and large
+    # certificate runs go through the chunked renderer, the rest through
+    # build_report.
+    parallel = len(students) > PARALLEL_CHUNK_SIZE
+    if report_format in ZIP_FORMATS:
+        return StudentDocuments(ZIP_FORMATS[report_format], lambda: _list_rows(students),
+                                top_lines, len(students), progress, parallel)
+    if report_format in STREAMING_FORMATS and parallel:
+        return StreamingReport(report_format, lambda: _list_rows(students),
+                               top_lines, len(students), progress, parallel)
+    return build_report(report_format, students, top_lines, progress)
+
+
+def report_filename(report_format, prefix='', pdf=False):
+    extension = 'pdf' if pdf else 'zip' if report_format in ZIP_FORMATS else 'docx'
+    return f'{prefix}{report_format}_report.{extension}'
+
+
+def report_columns(report_format):
+    # Unknown formats build an empty document; fetching everything is harmless
+    return REPORT_COLUMNS.get(ZIP_FORMATS.get(report_format, report_format), STUDENT_COLUMNS)
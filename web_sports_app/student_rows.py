@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+from web_sports_app.export import iter_export_rows
+from web_sports_app.students import STUDENT_FIELDS
+
+# Every column of the students table, in table order
+STUDENT_COLUMNS = ('id',) + STUDENT_FIELDS
+
+_record_types = {}
+
+
+def student_record(columns):
+    # A namedtuple class per column list. Fields are read by name
+    # (student.usn), so a query selecting different columns can't shift
+    # values into the wrong slot.
+    columns = tuple(columns)
+    record = _record_types.get(columns)
+    if record is None:
+        if not columns or columns[0] != 'id' or not set(columns) <= set(STUDENT_COLUMNS):
+            raise ValueError(f'Bad student columns: {columns}')
+        record = _record_types[columns] = type('Student', (namedtuple('Student', columns),), {
+            '__slots__': (),
+            # Rebuilt by column list, so rows can go to worker processes
+            '__reduce__': lambda self: (_rebuild, (self._fields, tuple(self))),
+        })
+    return record
+
+
+def _rebuild(columns, values):
+    return student_record(columns)._make(values)
+
+
+def parse_ids(values):
+    # Form values to unique ints, keeping the order they were given in
+    ids = []
+    seen = set()
+    for value in values:
+        try:
+            student_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if student_id not in seen:
+            seen.add(student_id)
+            ids.append(student_id)
+    return ids
+
+
+def fetch_students(conn, ids, columns=STUDENT_COLUMNS):
+    # The selected students in one query, returned in the order of ids.
+    # Unknown ids are left out.
+    record = student_record(columns)
+    ids = parse_ids(ids)
+    if not ids:
+        return []
+
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(record._fields)} FROM students WHERE id = ANY(%s)", (ids,))
+    position = {student_id: i for i, student_id in enumerate(ids)}
+    students = [record._make(row) for row in cur.fetchall()]
+    students.sort(key=lambda student: position[student.id])
+    return students
+
+
+def fetch_student(conn, student_id, columns=STUDENT_COLUMNS):
+    students = fetch_students(conn, [student_id], columns)
+    return students[0] if students else None
+
+
+def _roster_sql(record):
+    return f"SELECT {', '.join(record._fields)} FROM students ORDER BY name, id"
+
+
+def fetch_roster(conn, columns=STUDENT_COLUMNS):
+    # Every student, by name
+    record = student_record(columns)
+    cur = conn.cursor()
+    cur.execute(_roster_sql(record))
+    return [record._make(row) for row in cur.fetchall()]
+
+
+def iter_roster(conn, columns=STUDENT_COLUMNS):
+    # Same as fetch_roster through a server-side cursor
+    record = student_record(columns)
+    for row in iter_export_rows(conn, _roster_sql(record), []):
+        yield record._make(row)
@@ -0,0 +1,34 @@
+STUDENT_FIELDS = (
+    'name', 'dob', 'mother_name', 'father_name', 'branch', 'semester',
+    'usn', 'phone', 'email', 'photo_path', 'sports', 'blood_group', 'gender',
+)
+REQUIRED_FIELDS = ('name', 'branch', 'semester', 'usn', 'phone')
+
+
+def empty_to_none(value):
+    return value if value else None
+
+
+def clean_student(values):
+    # Strip every field; required ones stay '' when missing, optional ones
+    # become None, matching what the data entry form stores.
+    record = {}
+    for field in STUDENT_FIELDS:
+        value = values.get(field)
+        value = '' if value is None else str(value).strip()
+        record[field] = value if field in REQUIRED_FIELDS else empty_to_none(value)
+    return record
+
+
+def validate_student(name, usn, phone):
+    # Returns the first error message, in the order the form reports them
+    if not name:
+        return 'Name is required.'
+
+    if len(usn) != 10:
+        return 'USN must be exactly 10 characters.'
+
+    if not phone.isdigit() or len(phone) != 10:
+        return 'Phone number must be exactly 10 digits.'
+
+    return None
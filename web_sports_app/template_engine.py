@@ -0,0 +1,214 @@
+import hashlib
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from web_sports_app.students import STUDENT_FIELDS
+
+# [NAME], [USN], [BRANCH], ... one per column, plus the names the old
+# fill_template used for the parents.
+TEMPLATE_PLACEHOLDERS = {f.upper(): f for f in STUDENT_FIELDS if f != 'photo_path'}
+TEMPLATE_PLACEHOLDERS.update({'FATHER': 'father_name', 'MOTHER': 'mother_name'})
+
+# What fill_template fetches: every placeholder column, plus what
+# document_name needs
+TEMPLATE_COLUMNS = ('id',) + tuple(f for f in STUDENT_FIELDS if f != 'photo_path')
+
+TEMPLATE_CACHE_SIZE = int(os.environ.get('TEMPLATE_CACHE_SIZE', '16'))
+_compiled_cache = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_T = f'{{{W_NS}}}t'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+_PLACEHOLDER_RE = re.compile(r'\[(%s)\]' % '|'.join(TEMPLATE_PLACEHOLDERS))
+_PART_RE = re.compile(r'word/(document|header\d*|footer\d*)\.xml$')
+_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+# Control characters XML can't hold (pasted from Excel into an import file,
+# say). Escaping leaves them in and document.xml would not parse.
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _own_texts(paragraph):
+    # w:t nodes of this paragraph, leaving out text boxes nested inside it
+    texts = []
+    for t in paragraph.iter(W_T):
+        parent = t.getparent()
+        while parent.tag != W_P:
+            parent = parent.getparent()
+        if parent is paragraph:
+            texts.append(t)
+    return texts
+
+
+def _join_split_placeholders(paragraph):
+    # Word often splits "[NAME]" over several runs (spell check, an edit in
+    # the middle). Move each placeholder whole into the run it starts in so
+    # it keeps that run's formatting.
+    texts = _own_texts(paragraph)
+    if not texts:
+        return
+    full = ''.join(t.text or '' for t in texts)
+    if '[' not in full:
+        return
+
+    starts = []
+    offset = 0
+    for t in texts:
+        starts.append(offset)
+        offset += len(t.text or '')
+
+    def locate(pos):
+        for index in range(len(texts) - 1, -1, -1):
+            if starts[index] <= pos:
+                return index, pos - starts[index]
+
+    # Back to front, so earlier offsets stay valid
+    for match in reversed(list(_PLACEHOLDER_RE.finditer(full))):
+        first, first_at = locate(match.start())
+        last, last_at = locate(match.end() - 1)
+        if first != last:
+            head = texts[first].text or ''
+            texts[first].text = head[:first_at] + match.group(0)
+            for t in texts[first + 1:last]:
+                t.text = ''
+            texts[last].text = (texts[last].text or '')[last_at + 1:]
+        texts[first].set(XML_SPACE, 'preserve')
+
+
+def _segments(xml):
+    # Literal XML alternating with column names: ['<w:p>..', 'name', '..']
+    parts = _PLACEHOLDER_RE.split(xml)
+    return [TEMPLATE_PLACEHOLDERS[part] if i % 2 else part for i, part in enumerate(parts)]
+
+
+def _render(segments, student):
+    out = []
+    for i, segment in enumerate(segments):
+        if i % 2 == 0:
+            out.append(segment)
+        else:
+            value = getattr(student, segment)
+            text = _XML_ILLEGAL_RE.sub('', '' if value is None else str(value))
+            out.append(escape(text, {'"': '&quot;'}))
+    return ''.join(out)
+
+
+class CompiledTemplate:
+    # An uploaded .docx parsed once: every part that can hold placeholders is
+    # kept as segments. Everything else (styles, images) is deflated once into
+    # a base zip that each rendered document starts from, so only the filled
+    # in parts are compressed per student.
+
+    def __init__(self, data):
+        self.parts = {}
+        base = BytesIO()
+        with zipfile.ZipFile(BytesIO(data)) as zf, \
+                zipfile.ZipFile(base, 'w', zipfile.ZIP_DEFLATED) as zbase:
+            for info in zf.infolist():
+                raw = zf.read(info.filename)
+                if not _PART_RE.match(info.filename):
+                    zbase.writestr(info, raw, zipfile.ZIP_DEFLATED)
+                    continue
+                root = etree.fromstring(raw)
+                for paragraph in root.iter(W_P):
+                    _join_split_placeholders(paragraph)
+                xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True).decode('utf-8')
+                self.parts[info.filename] = xml
+        self.base = base.getvalue()
+
+        # The body alone, for merging several students into one document
+        document = self.parts['word/document.xml']
+        body_start = document.index('>', document.index('<w:body')) + 1
+        body_end = document.rfind('<w:sectPr')
+        if body_end < body_start:
+            body_end = document.rindex('</w:body>')
+        self.body_prefix = document[:body_start]
+        self.body = _segments(document[body_start:body_end])
+        self.body_suffix = document[body_end:]
+        self.parts = {name: _segments(xml) for name, xml in self.parts.items()}
+
+    def _write(self, file, student, body_chunks=None):
+        # file must be empty and open for reading and writing
+        file.write(self.base)
+        with zipfile.ZipFile(file, 'a', zipfile.ZIP_DEFLATED) as zout:
+            for name, segments in self.parts.items():
+                if name == 'word/document.xml' and body_chunks is not None:
+                    with zout.open(name, 'w', force_zip64=True) as out:
+                        out.write(self.body_prefix.encode('utf-8'))
+                        for chunk in body_chunks:
+                            out.write(chunk.encode('utf-8'))
+                        out.write(self.body_suffix.encode('utf-8'))
+                else:
+                    zout.writestr(name, _render(segments, student).encode('utf-8'))
+
+    def render(self, student, file):
+        buf = BytesIO()
+        self._write(buf, student)
+        file.write(buf.getvalue())
+
+    def render_merged(self, students, file, progress=None):
+        # One document, a page per student, written into file (w+b). Headers
+        # and footers exist once per section, so they come from the first
+        # student.
+        def body_chunks():
+            for i, student in enumerate(students):
+                if i:
+                    yield _PAGE_BREAK
+                yield _render(self.body, student)
+                if progress is not None:
+                    progress(i + 1, len(students))
+
+        self._write(file, students[0], body_chunks())
+
+    def render_zip(self, students, file, progress=None):
+        # A .docx per student; they are already deflated, so store them as-is
+        with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED) as zout:
+            used = set()
+            for i, student in enumerate(students):
+                name = document_name(student, used)
+                with zout.open(name, 'w', force_zip64=True) as out:
+                    self.render(student, out)
+                if progress is not None:
+                    progress(i + 1, len(students))
+
+
+def document_name(student, used):
+    stem = re.sub(r'[^A-Za-z0-9]+', '_', f"{student.usn or student.id}_{student.name or ''}").strip('_')
+    name = f'{stem}.docx'
+    n = 2
+    while name in used:
+        name = f'{stem}_{n}.docx'
+        n += 1
+    used.add(name)
+    return name
+
+
+def compile_template(path):
+    # Compiled templates are cached by the hash of the file, so re-uploading
+    # the same template (or one with the same name) is always handled right.
+    with open(path, 'rb') as f:
+        data = f.read()
+    key = hashlib.sha256(data).hexdigest()
+
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            _compiled_cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledTemplate(data)
+
+    with _compiled_cache_lock:
+        _compiled_cache[key] = compiled
+        while len(_compiled_cache) > TEMPLATE_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
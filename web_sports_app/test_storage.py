@@ -0,0 +1,45 @@
+import pytest
+
+from web_sports_app.app import app
+from web_sports_app.storage import LocalStorage, MemoryStorage, is_safe_name, set_storage
+
+
+@pytest.fixture
+def client(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    with app.app_context():
+        storage.save(b'photo', 'ab/photo.jpg')
+    set_storage(storage)
+    yield app.test_client()
+    set_storage(MemoryStorage())
+
+
+def test_media_serves_stored_photo(client):
+    response = client.get('/media/ab/photo.jpg')
+    assert response.status_code == 200
+    assert response.data == b'photo'
+
+
+@pytest.mark.parametrize('path', [
+    '/media/../app.py',
+    '/media/..%2F..%2Fapp.py',
+    '/media/' + '..%2F' * 12 + 'etc/passwd',
+    '/media/ab/../../app.py',
+])
+def test_media_refuses_paths_outside_storage(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_backends_refuse_unsafe_names(tmp_path):
+    assert not is_safe_name('../app.py')
+    assert not is_safe_name('/etc/passwd')
+    assert not is_safe_name('')
+    assert is_safe_name('ab/' + 'c' * 64 + '.jpg')
+
+    for storage in (LocalStorage(str(tmp_path)), MemoryStorage()):
+        assert not storage.exists('../app.py')
+        with pytest.raises(ValueError):
+            storage.read('../app.py')
+        with pytest.raises(ValueError):
+            storage.save(b'x', '../escaped.jpg')
+    assert not (tmp_path.parent / 'escaped.jpg').exists()
@@ -0,0 +1,51 @@
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+
+import pytest
+
+from web_sports_app.reports import REPORT_COLUMNS, build_report
+from web_sports_app.streaming_docx import STREAMING_FORMATS, StreamingReport
+from web_sports_app.student_rows import student_record
+
+
+def _students(report_format, names):
+    record = student_record(REPORT_COLUMNS[report_format])
+    students = []
+    for i, name in enumerate(names, 1):
+        values = {column: f'{column} {i}' for column in record._fields}
+        values.update(id=i, name=name, usn=f'1AB21CS{i:03d}', phone='', sports=None)
+        students.append(record(**{column: values[column] for column in record._fields}))
+    return students
+
+
+def _document_xml(doc):
+    buf = BytesIO()
+    doc.save(buf)
+    with zipfile.ZipFile(buf) as zf:
+        return zf.read('word/document.xml')
+
+
+def _streaming(report_format, students):
+    @contextmanager
+    def open_rows():
+        yield iter(students)
+    return StreamingReport(report_format, open_rows, 5, len(students))
+
+
+@pytest.mark.parametrize('report_format', STREAMING_FORMATS)
+def test_streaming_matches_build_report(report_format):
+    names = ['Asha', 'B & <C>', ' padded ', 'Line\nbreak', 'Tab\there', '']
+    students = _students(report_format, names)
+    expected = _document_xml(build_report(report_format, students, top_lines=5))
+    assert _document_xml(_streaming(report_format, students)) == expected
+
+
+@pytest.mark.parametrize('report_format', STREAMING_FORMATS)
+@pytest.mark.parametrize('name', ['Vertical\x0btab', 'Nul\x00byte', 'Escape\x1b'])
+def test_streaming_rejects_xml_illegal_characters_like_build_report(report_format, name):
+    students = _students(report_format, ['Asha', name])
+    with pytest.raises(ValueError):
+        build_report(report_format, students, top_lines=5)
+    with pytest.raises(ValueError):
+        _document_xml(_streaming(report_format, students))
@@ -0,0 +1,47 @@
+import zipfile
+from io import BytesIO
+
+from docx import Document
+from lxml import etree
+
+from web_sports_app.student_rows import student_record
+from web_sports_app.template_engine import TEMPLATE_COLUMNS, CompiledTemplate
+
+
+def _template():
+    doc = Document()
+    doc.add_paragraph('Name: [NAME]')
+    doc.add_paragraph('USN: [USN]')
+    buf = BytesIO()
+    doc.save(buf)
+    return CompiledTemplate(buf.getvalue())
+
+
+def _students(*names):
+    record = student_record(TEMPLATE_COLUMNS)
+    students = []
+    for i, name in enumerate(names, 1):
+        values = dict.fromkeys(TEMPLATE_COLUMNS)
+        values.update(id=i, name=name, usn=f'1AB21CS{i:03d}')
+        students.append(record(**values))
+    return students
+
+
+def _text(docx):
+    with zipfile.ZipFile(docx) as zf:
+        root = etree.fromstring(zf.read('word/document.xml'))
+    return ''.join(root.itertext())
+
+
+def test_render_merged_strips_xml_illegal_characters():
+    out = BytesIO()
+    _template().render_merged(_students('Vertical\x0btab', 'Nul\x00 & <Esc\x1b>'), out)
+    text = _text(out)
+    assert 'Verticaltab' in text
+    assert 'Nul & <Esc>' in text
+
+
+def test_render_keeps_tabs_and_newlines():
+    out = BytesIO()
+    _template().render(_students('Tab\there')[0], out)
+    assert 'Tab\there' in _text(BytesIO(out.getvalue()))
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# name -> (width, height, crop). "small" is the round 50x50 avatar in the
+# list pages (2x for high-DPI screens), "report" matches the 1in x 1.3in
+# photo box in the VTU proforma at ~300 dpi.
+THUMBNAIL_SIZES = {
+    'small': (100, 100, True),
+    'medium': (300, 300, False),
+    'report': (300, 390, False),
+}
+JPEG_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '80'))
+
+# Prepared report images, keyed by sha256 of the source bytes
+EMBED_CACHE_BYTES = int(os.environ.get('EMBED_CACHE_BYTES', str(32 * 1024 * 1024)))
+_embed_cache = OrderedDict()
+_embed_cache_size = 0
+_embed_cache_lock = threading.Lock()
+
+
+def thumbnail_name(filename, size):
+    # The full name, extension included, so IMG_1.jpg and IMG_1.png get
+    # separate thumbnails
+    return f"thumbs/{size}/{filename}.jpg"
+
+
+def make_thumbnail(data, size):
+    width, height, crop = THUMBNAIL_SIZES[size]
+
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if crop:
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+
+        out = BytesIO()
+        # Saving without exif= drops camera metadata along the way
+        image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def generate_thumbnails(storage, data, filename, stage=False):
+    # Returns the names written. stage=True keeps them on this machine for
+    # the photo upload worker to push.
+    save = storage.stage if stage else storage.save
+    names = []
+    for size in THUMBNAIL_SIZES:
+        try:
+            save(make_thumbnail(data, size), thumbnail_name(filename, size))
+            names.append(thumbnail_name(filename, size))
+        except Exception as e:
+            print(f"Thumbnail {size} failed for {filename}: {e}")
+    return names
+
+
+def thumbnail_url(storage, filename, size):
+    name = thumbnail_name(filename, size)
+    # Local files are cheap to check; remote backends are trusted to have
+    # thumbnails once backfill-thumbnails has run, except for a photo still
+    # staged here whose thumbnails the upload worker hasn't made yet.
+    if storage.cheap_exists:
+        if not storage.exists(name):
+            return storage.url(filename)
+    elif storage.local_path(filename) and not storage.local_path(name):
+        return storage.url(filename)
+    return storage.url(name)
+
+
+def read_embed_image(storage, filename, size='report'):
+    # Bytes to put in a report, None if the photo is missing. The stored
+    # thumbnail is already a prepared JPEG and goes in as it is; only an
+    # original without thumbnails yet is prepared here.
+    name = thumbnail_name(filename, size)
+    if storage.exists(name):
+        return storage.read(name)
+    if storage.exists(filename):
+        return prepare_embed_image(storage.read(filename), size)
+    return None
+
+
+def backfill_thumbnails(storage, filenames, force=False):
+    done = skipped = failed = 0
+    for filename in filenames:
+        if not force and all(storage.exists(thumbnail_name(filename, size)) for size in THUMBNAIL_SIZES):
+            skipped += 1
+            continue
+        if not storage.exists(filename):
+            print(f"Missing original photo: {filename}")
+            failed += 1
+            continue
+        generate_thumbnails(storage, storage.read(filename), filename)
+        done += 1
+    return done, skipped, failed
+
+
+def prepare_embed_image(data, size='report'):
+    # Downscaled, metadata-free bytes for embedding in a .docx. The output is
+    # deterministic per source, so python-docx (which dedupes image parts by
+    # SHA1) stores a photo used by several rows only once.
+    global _embed_cache_size
+
+    key = (hashlib.sha256(data).hexdigest(), size)
+    with _embed_cache_lock:
+        prepared = _embed_cache.get(key)
+        if prepared is not None:
+            _embed_cache.move_to_end(key)
+            return prepared
+
+    try:
+        prepared = make_thumbnail(data, size)
+    except Exception as e:
+        print(f"Could not prepare report image: {e}")
+        return data
+
+    with _embed_cache_lock:
+        if key not in _embed_cache:
+            _embed_cache[key] = prepared
+            _embed_cache_size += len(prepared)
+            while _embed_cache_size > EMBED_CACHE_BYTES and _embed_cache:
+                _, evicted = _embed_cache.popitem(last=False)
+                _embed_cache_size -= len(evicted)
+    return prepared
@@ -0,0 +1,38 @@
+import os
+import queue
+import threading
+
+
+class WorkerPool:
+    # A queue served by daemon threads, started on the first put. Threads
+    # don't survive fork, so each gunicorn worker starts its own.
+    def __init__(self, handle, workers):
+        self._handle = handle
+        self._workers = workers
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _work(self, task_queue):
+        while True:
+            task = task_queue.get()
+            try:
+                self._handle(*task)
+            finally:
+                task_queue.task_done()
+
+    def _get_queue(self):
+        pid = os.getpid()
+        if self._queue is not None and self._pid == pid:
+            return self._queue
+
+        with self._lock:
+            if self._queue is None or self._pid != pid:
+                self._queue = queue.Queue()
+                for _ in range(self._workers):
+                    threading.Thread(target=self._work, args=(self._queue,), daemon=True).start()
+                self._pid = pid
+        return self._queue
+
+    def put(self, *task):
+        self._get_queue().put(task)